@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+DATA_TYPES = {
+    "int": "sc:Integer",
+    "float": "sc:Float",
+    "text": "sc:Text",
+    "boolean": "sc:Boolean",
+    "date": "sc:Date",
+}
+PATHOLOGICAL_CASES = [
+    "empty",
+    "wide",
+    "quoted",
+    "mixed",
+    "non_finite",
+    "unique_text",
+    "bad_dates",
+    "column_mismatch",
+    "missing_file",
+    "nested",
+]
+WORDS = [
+    "alpha", "beta", "gamma", "delta", "epsilon", "zeta", "theta", "kappa", "lambda", "sigma",
+    "north", "south", "east", "west", "red", "green", "blue", "small", "large", "other",
+    "café", "über", "niño", "façade", "smörgåsbord", "jalapeño", "naïve", "crème", "señor", "año",
+]  # fmt: skip
+
+
+@dataclass
+class CorpusConfig:
+    """Shape of a synthetic corpus. Ranges are inclusive and sampled per dataset or file."""
+
+    n_datasets: int = 100
+    files: tuple[int, int] = (1, 3)
+    rows: tuple[int, int] = (100, 10_000)
+    columns: tuple[int, int] = (2, 20)
+    dtype_mix: dict[str, float] = field(
+        default_factory=lambda: {
+            "int": 0.3,
+            "float": 0.3,
+            "text": 0.25,
+            "boolean": 0.1,
+            "date": 0.05,
+        }
+    )
+    encodings: list[str] = field(default_factory=lambda: ["utf-8"])
+    delimiters: list[str] = field(default_factory=lambda: [","])
+    null_fraction: float = 0.05
+    pathological: list[str] = field(default_factory=list)
+    pathological_fraction: float = 0.0
+    seed: int = 0
+
+
+def format_size(n_bytes: int) -> str:
+    """Format a size the way Kaggle reports `contentSize`."""
+    value = float(n_bytes)
+    for unit in ["B", "KB", "MB", "GB"]:
+        if value < 1024:  # noqa: PLR2004
+            return f"{value:.4g} {unit}"
+        value /= 1024
+    return f"{value:.4g} TB"
+
+
+class CorpusGenerator:
+    """Generate Kaggle-like dataset directories with Croissant metadata and matching CSV files.
+
+    Every dataset is written to `<user>/<slug>/` with a `croissant_metadata.json` whose
+    `distribution` and `recordSet` describe the CSV files next to it, i.e. the layout that
+    `download_datasets.py` produces. A fraction of the files can be replaced by pathological
+    cases that exercise the error handling of the enrichment.
+    """
+
+    def __init__(self, config: CorpusConfig, output_dir: Path) -> None:
+        self.config = config
+        self.output_dir = output_dir
+        self.rng = np.random.default_rng(config.seed)
+        self.dtypes = list(config.dtype_mix)
+        weights = np.array(list(config.dtype_mix.values()), dtype=float)
+        self.dtype_weights = weights / weights.sum()
+        unknown = set(self.dtypes) - DATA_TYPES.keys()
+        unknown |= set(config.pathological) - set(PATHOLOGICAL_CASES)
+        if unknown:
+            raise ValueError(f"Unknown data types or pathological cases: {sorted(unknown)}")
+
+    def between(self, bounds: tuple[int, int]) -> int:
+        return int(self.rng.integers(bounds[0], bounds[1] + 1))
+
+    def make_column(self, data_type: str, n_rows: int) -> pd.Series:
+        rng = self.rng
+        values: pd.Series
+        if data_type == "int":
+            scale = 10 ** rng.integers(1, 7)
+            values = pd.Series(rng.integers(-scale, scale, n_rows), dtype="Int64")
+        elif data_type == "float":
+            values = pd.Series(rng.lognormal(rng.uniform(0, 5), rng.uniform(0.1, 2), n_rows))
+        elif data_type == "text":
+            # zipf-distributed words give realistic heavy hitters and a long tail
+            words = np.array(WORDS, dtype=object)
+            ranks = np.minimum(rng.zipf(1.5, n_rows), len(WORDS)) - 1
+            suffixes = rng.integers(0, max(n_rows // 10, 1), n_rows).astype(str)
+            values = pd.Series(words[ranks] + "_" + suffixes, dtype=object)
+        elif data_type == "boolean":
+            values = pd.Series(rng.random(n_rows) < rng.uniform(0.1, 0.9))
+            values = values.map({True: "True", False: "False"}).astype(object)
+        else:
+            start = np.datetime64("2000-01-01") + rng.integers(0, 7000)
+            offsets = rng.integers(0, 3650, n_rows).astype("timedelta64[D]")
+            values = pd.Series((start + offsets).astype(str), dtype=object)
+        if self.config.null_fraction > 0:
+            values = values.astype(object)
+            values[rng.random(n_rows) < self.config.null_fraction] = None
+        return values
+
+    def make_table(self, n_rows: int, data_types: list[str], case: str | None) -> pd.DataFrame:
+        table = pd.DataFrame(
+            {f"col_{j}": self.make_column(t, n_rows) for j, t in enumerate(data_types)}
+        )
+        if case is None or table.empty:
+            return table
+        positions = {t: [j for j, dt in enumerate(data_types) if dt == t] for t in DATA_TYPES}
+        rows = self.rng.random(n_rows) < 0.01  # noqa: PLR2004
+        if case == "quoted" and positions["text"]:
+            # delimiters, quotes and line breaks inside quoted values
+            j = positions["text"][0]
+            table.iloc[rows, j] = 'a, "quoted"; value|\nwith a line break'
+        elif case == "mixed" and (numeric := positions["int"] + positions["float"]):
+            table.iloc[:, numeric[0]] = table.iloc[:, numeric[0]].astype(object)
+            table.iloc[rows, numeric[0]] = "n/a"
+        elif case == "non_finite" and positions["float"]:
+            j = positions["float"][0]
+            table.iloc[rows, j] = self.rng.choice([np.inf, -np.inf, np.nan], int(rows.sum()))
+        elif case == "unique_text" and positions["text"]:
+            table.iloc[:, positions["text"][0]] = [
+                f"id_{i:x}" for i in self.rng.permutation(n_rows)
+            ]
+        elif case == "bad_dates" and positions["date"]:
+            table.iloc[rows, positions["date"][0]] = "31/02/20xx"
+        return table
+
+    def make_file(
+        self, dataset_dir: Path, name: str, case: str | None
+    ) -> tuple[dict[str, Any], dict[str, Any], int]:
+        """Write one CSV file and return its distribution entry, record and size in bytes."""
+        config = self.config
+        n_columns = self.between(config.columns)
+        if case == "wide":
+            n_columns = max(n_columns, 500)
+        n_rows = 0 if case == "empty" else self.between(config.rows)
+        data_types = list(self.rng.choice(self.dtypes, n_columns, p=self.dtype_weights))
+        if case == "nested":
+            name = f"nested dir/{name.removesuffix('.csv')} (v2).csv"
+        path = dataset_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        table = self.make_table(n_rows, data_types, case)
+        size = 0
+        if case != "missing_file":
+            table.to_csv(
+                path,
+                sep=str(self.rng.choice(config.delimiters)),
+                encoding=str(self.rng.choice(config.encodings)),
+                index=False,
+            )
+            size = path.stat().st_size
+        if case == "column_mismatch":
+            data_types.append("int")
+
+        file_id = name.replace("/", "_")
+        distribution = {
+            "@type": "cr:FileObject",
+            "@id": file_id,
+            "name": file_id,
+            "containedIn": {"@id": "archive.zip"},
+            "contentUrl": quote(name),
+            "encodingFormat": "text/csv",
+        }
+        fields = [
+            {
+                "@type": "cr:Field",
+                "@id": f"{file_id}/col_{j}",
+                "name": f"col_{j}",
+                "dataType": [DATA_TYPES[t]],
+                "source": {"fileObject": {"@id": file_id}, "extract": {"column": f"col_{j}"}},
+            }
+            for j, t in enumerate(data_types)
+        ]
+        record = {"@type": "cr:RecordSet", "@id": file_id, "name": file_id, "field": fields}
+        return distribution, record, size
+
+    def make_dataset(self, i: int) -> int:
+        """Write dataset `i` and return the size of its CSV files in bytes."""
+        config = self.config
+        ref = f"user{i % 97}/synthetic-dataset-{i}"
+        dataset_dir = self.output_dir / ref
+        dataset_dir.mkdir(parents=True, exist_ok=True)
+
+        distribution: list[dict[str, Any]] = []
+        records: list[dict[str, Any]] = []
+        total = 0
+        for j in range(self.between(config.files)):
+            case = None
+            if config.pathological and self.rng.random() < config.pathological_fraction:
+                case = str(self.rng.choice(config.pathological))
+            entry, record, size = self.make_file(dataset_dir, f"file_{j}.csv", case)
+            distribution.append(entry)
+            records.append(record)
+            total += size
+
+        archive = {
+            "@type": "cr:FileObject",
+            "@id": "archive.zip",
+            "name": "archive.zip",
+            "contentUrl": f"https://www.kaggle.com/api/v1/datasets/download/{ref}",
+            "encodingFormat": "application/zip",
+            "contentSize": format_size(total),
+        }
+        metadata = {
+            "@context": {"@language": "en", "@vocab": "https://schema.org/"},
+            "@type": "sc:Dataset",
+            "name": f"Synthetic dataset {i}",
+            "alternateName": "" if i % 3 == 0 else f"Generated dataset number {i}",
+            "description": f"Synthetic dataset {i} for benchmarking.",
+            "license": {"@type": "sc:CreativeWork", "name": "Unknown" if i % 4 else "CC0"},
+            "keywords": [] if i % 2 else ["synthetic", "benchmark"],
+            "url": f"https://www.kaggle.com/datasets/{ref}",
+            "distribution": [archive, *distribution],
+            "recordSet": records,
+            "kaggleRef": ref,
+        }
+        with (dataset_dir / "croissant_metadata.json").open("w", encoding="utf-8") as file:
+            json.dump(metadata, file, indent=4, ensure_ascii=False)
+        return total
+
+    def generate(self) -> int:
+        """Write the corpus and a `corpus.json` with its config, and return the CSV bytes."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        total = sum(
+            self.make_dataset(i) for i in tqdm(range(self.config.n_datasets), desc="Generating")
+        )
+        summary = {"config": asdict(self.config), "csvBytes": total}
+        (self.output_dir / "corpus.json").write_text(json.dumps(summary, indent=2), "utf-8")
+        return total
+
+
+def parse_range(value: str) -> tuple[int, int]:
+    low, _, high = value.partition("-")
+    return int(low), int(high or low)
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """Parse a mix like `int=3,text=1` into weights."""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def add_corpus_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments that shape a corpus, except for its number of datasets."""
+    default = CorpusConfig()
+    parser.add_argument(
+        "--files",
+        type=parse_range,
+        default=default.files,
+        help="range of CSV files per dataset, e.g. 1-3 (default %(default)s)",
+    )
+    parser.add_argument(
+        "--rows",
+        type=parse_range,
+        default=default.rows,
+        help="range of rows per file (default %(default)s)",
+    )
+    parser.add_argument(
+        "--columns",
+        type=parse_range,
+        default=default.columns,
+        help="range of columns per file (default %(default)s)",
+    )
+    parser.add_argument(
+        "--dtype-mix",
+        type=parse_mix,
+        default=default.dtype_mix,
+        help=f"weights of the column types {list(DATA_TYPES)} (default %(default)s)",
+    )
+    parser.add_argument(
+        "--encodings",
+        type=lambda x: x.split(","),
+        default=default.encodings,
+        help="comma-separated encodings sampled per file, e.g. utf-8,latin-1,utf-16 "
+        "(default %(default)s)",
+    )
+    parser.add_argument(
+        "--delimiters",
+        type=lambda x: list(x.replace("\\t", "\t")),
+        default=default.delimiters,
+        help="delimiters sampled per file, e.g. ',;\\t|' (default %(default)s)",
+    )
+    parser.add_argument(
+        "--null-fraction",
+        type=float,
+        default=default.null_fraction,
+        help="fraction of missing values per column (default %(default)s)",
+    )
+    parser.add_argument(
+        "--pathological",
+        type=lambda x: PATHOLOGICAL_CASES if x == "all" else x.split(","),
+        default=default.pathological,
+        help=f"comma-separated pathological cases or 'all' {PATHOLOGICAL_CASES} (default none)",
+    )
+    parser.add_argument(
+        "--pathological-fraction",
+        type=float,
+        default=0.05,
+        help="fraction of files that are pathological cases (default %(default)s)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=default.seed, help="random seed (default %(default)s)"
+    )
+
+
+def corpus_config(args: argparse.Namespace, n_datasets: int) -> CorpusConfig:
+    return CorpusConfig(
+        n_datasets=n_datasets,
+        files=args.files,
+        rows=args.rows,
+        columns=args.columns,
+        dtype_mix=args.dtype_mix,
+        encodings=args.encodings,
+        delimiters=args.delimiters,
+        null_fraction=args.null_fraction,
+        pathological=args.pathological,
+        pathological_fraction=args.pathological_fraction,
+        seed=args.seed,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="generate a synthetic kaggle corpus")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="../synthetic_corpus",
+        help="path for the generated corpus (default %(default)s)",
+    )
+    parser.add_argument(
+        "-n",
+        "--datasets",
+        type=int,
+        default=CorpusConfig.n_datasets,
+        help="number of datasets (default %(default)s)",
+    )
+    add_corpus_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    output_dir = Path(args.output)
+    if output_dir.exists() and any(output_dir.iterdir()):
+        print(f"{output_dir} is not empty, choose a new output directory!")
+        sys.exit(1)
+
+    generator = CorpusGenerator(corpus_config(args, args.datasets), output_dir)
+    total = generator.generate()
+    print(f"Generated {args.datasets} datasets with {total / 1024**2:.1f} MB of CSV files.")
+
+
+if __name__ == "__main__":
+    main()
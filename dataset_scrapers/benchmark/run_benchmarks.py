@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import json
+import multiprocessing as mp
+import operator
+import os
+import platform
+import resource
+import shutil
+import subprocess  # noqa: S404
+import sys
+import time
+from dataclasses import asdict, replace
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from dataset_scrapers.benchmark.generate_corpus import (
+    CorpusConfig,
+    CorpusGenerator,
+    add_corpus_arguments,
+    corpus_config,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from multiprocessing.queues import Queue
+
+
+def run_analyze(corpus_dir: Path, work_dir: Path, workers: int) -> int:
+    """Analyze the metadata of the corpus and return the bytes processed."""
+    from dataset_scrapers.kaggle.analyze_metadata import MetadataAnalyzer  # noqa: PLC0415
+
+    MetadataAnalyzer(corpus_dir, work_dir).start()
+    return sum(path.stat().st_size for path in corpus_dir.rglob("croissant_metadata.json"))
+
+
+def run_enrich(corpus_dir: Path, work_dir: Path, workers: int) -> int:
+    """Enrich the corpus and return the bytes processed."""
+    from dataset_scrapers.kaggle.enrich_profiles import HistogramCreator  # noqa: PLC0415
+
+    result_dir = work_dir / "result"
+    result_dir.mkdir()
+    creator = HistogramCreator(
+        source_dir=corpus_dir,
+        target_dir=result_dir,
+        error_log=work_dir / "errors.jsonl",
+        max_count=sys.maxsize,
+        workers=workers,
+    )
+    creator.start()
+    summary = json.loads((corpus_dir / "corpus.json").read_text(encoding="utf-8"))
+    return int(summary["csvBytes"])
+
+
+def run_download(corpus_dir: Path, work_dir: Path, workers: int) -> int:
+    """Crawl the corpus from a local Kaggle stand-in and return the bytes downloaded."""
+    from dataset_scrapers.kaggle.load_test import LoadTester  # noqa: PLC0415
+
+    report = LoadTester(corpus_dir, work_dir, workers=workers).run()
+    return int(report["datasets"]["bytes"])
+
+
+STAGES: dict[str, Callable[[Path, Path, int], int]] = {
+    "download": run_download,
+    "analyze": run_analyze,
+    "enrich": run_enrich,
+}
+# stages that run in a single process regardless of the worker count
+SERIAL_STAGES = {"analyze"}
+
+
+def measure(
+    stage: str, corpus_dir: Path, work_dir: Path, workers: int, results: Queue[dict[str, Any]]
+) -> None:
+    """Run a stage in a fresh process, so that its peak RSS is not inflated by earlier runs."""
+    # silence the stage on the file descriptor level, so that its workers are silenced as well
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, sys.stdout.fileno())
+    os.dup2(devnull, sys.stderr.fileno())
+    start = time.perf_counter()
+    n_bytes = STAGES[stage](corpus_dir, work_dir, workers)
+    seconds = time.perf_counter() - start
+    # ru_maxrss is reported in KB on Linux
+    results.put(
+        {
+            "seconds": seconds,
+            "bytes": n_bytes,
+            "parentRss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "workerRss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024,
+        }
+    )
+
+
+class BenchmarkRunner:
+    def __init__(
+        self,
+        work_dir: Path,
+        results_path: Path,
+        config: CorpusConfig,
+        scales: list[int],
+        workers: list[int],
+        stages: list[str],
+        repeat: int = 1,
+    ) -> None:
+        self.work_dir = work_dir
+        self.results_path = results_path
+        self.config = config
+        self.scales = scales
+        self.workers = workers
+        self.stages = stages
+        self.repeat = repeat
+        self.context = mp.get_context("spawn")
+
+    def corpus(self, n_datasets: int) -> Path:
+        """Return a corpus of the given scale, generating it unless it exists from earlier runs."""
+        config = replace(self.config, n_datasets=n_datasets)
+        digest = hashlib.blake2b(
+            json.dumps(asdict(config), sort_keys=True).encode(), digest_size=8
+        ).hexdigest()
+        corpus_dir = self.work_dir / "corpora" / f"{n_datasets}-{digest}"
+        if not (corpus_dir / "corpus.json").exists():
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+            CorpusGenerator(config, corpus_dir).generate()
+        return corpus_dir
+
+    def run_once(self, stage: str, corpus_dir: Path, workers: int) -> dict[str, Any]:
+        run_dir = self.work_dir / "runs" / f"{stage}-{workers}"
+        shutil.rmtree(run_dir, ignore_errors=True)
+        run_dir.mkdir(parents=True)
+        results: Queue[dict[str, Any]] = self.context.Queue()
+        process = self.context.Process(
+            target=measure, args=(stage, corpus_dir, run_dir, workers, results)
+        )
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError(f"Stage {stage} exited with code {process.exitcode}")
+        result: dict[str, Any] = results.get()
+        shutil.rmtree(run_dir, ignore_errors=True)
+        return result
+
+    def run(self) -> list[dict[str, Any]]:
+        measurements = []
+        for n_datasets in self.scales:
+            corpus_dir = self.corpus(n_datasets)
+            for stage in self.stages:
+                for workers in [1] if stage in SERIAL_STAGES else self.workers:
+                    # keep the fastest repetition, the others are slowed down by noise
+                    runs = [self.run_once(stage, corpus_dir, workers) for _ in range(self.repeat)]
+                    best = min(runs, key=operator.itemgetter("seconds"))
+                    seconds = best["seconds"]
+                    measurement = {
+                        "stage": stage,
+                        "datasets": n_datasets,
+                        "workers": workers,
+                        "seconds": seconds,
+                        "datasetsPerSecond": n_datasets / seconds,
+                        "mbPerSecond": best["bytes"] / 1024**2 / seconds,
+                        "parentRss": max(run["parentRss"] for run in runs),
+                        "workerRss": max(run["workerRss"] for run in runs),
+                    }
+                    print(format_measurement(measurement))
+                    measurements.append(measurement)
+        return measurements
+
+    def save(self, measurements: list[dict[str, Any]]) -> dict[str, Any]:
+        """Append the measurements to the results file together with the environment."""
+        corpus = {k: v for k, v in asdict(self.config).items() if k != "n_datasets"}
+        commit = None
+        with contextlib.suppress(OSError, subprocess.CalledProcessError):
+            commit = subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+                capture_output=True,
+                check=True,
+                cwd=Path(__file__).parent,
+                text=True,
+            ).stdout.strip()
+        run = {
+            "run": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "repeat": self.repeat,
+            # round-trip through JSON so that the run compares equal to stored runs
+            "corpus": json.loads(json.dumps(corpus)),
+            "results": measurements,
+        }
+        self.results_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.results_path.open("a", encoding="utf-8") as file:
+            file.write(json.dumps(run) + "\n")
+        return run
+
+
+def format_measurement(measurement: dict[str, Any]) -> str:
+    return (
+        f"{measurement['stage']:>8} {measurement['datasets']:>7} datasets "
+        f"{measurement['workers']:>3} workers: {measurement['seconds']:8.2f}s "
+        f"{measurement['datasetsPerSecond']:9.1f} datasets/s "
+        f"{measurement['mbPerSecond']:8.1f} MB/s "
+        f"peak RSS {measurement['parentRss'] / 1024**2:.0f} MB "
+        f"(workers {measurement['workerRss'] / 1024**2:.0f} MB)"
+    )
+
+
+def load_runs(path: Path) -> list[dict[str, Any]]:
+    if not path.exists():
+        return []
+    with path.open(encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def compare(run: dict[str, Any], baseline: dict[str, Any]) -> None:
+    """Print the speedup and memory change of each measurement over the baseline run."""
+    print(f"Compared to run {baseline['run']} (commit {baseline['commit']}):")
+    if run["corpus"] != baseline["corpus"]:
+        print("Warning: the runs used different corpus configurations")
+    previous = {(m["stage"], m["datasets"], m["workers"]): m for m in baseline["results"]}
+    for measurement in run["results"]:
+        key = (measurement["stage"], measurement["datasets"], measurement["workers"])
+        if key not in previous:
+            continue
+        old = previous[key]
+        speedup = old["seconds"] / measurement["seconds"]
+        rss = max(measurement["parentRss"], measurement["workerRss"])
+        old_rss = max(old["parentRss"], old["workerRss"])
+        print(
+            f"{key[0]:>8} {key[1]:>7} datasets {key[2]:>3} workers: {speedup:5.2f}x speedup, "
+            f"peak RSS {(rss - old_rss) / 1024**2:+.0f} MB"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="benchmark the kaggle pipeline")
+    parser.add_argument(
+        "--work-dir",
+        type=str,
+        default="../benchmarks",
+        help="path for generated corpora and temporary output (default %(default)s)",
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        default="../benchmarks/results.jsonl",
+        help="path to the results of all benchmark runs (default %(default)s)",
+    )
+    parser.add_argument(
+        "--stages",
+        type=lambda x: x.split(","),
+        default=list(STAGES),
+        help=f"comma-separated stages to benchmark {list(STAGES)} (default all)",
+    )
+    parser.add_argument(
+        "--scales",
+        type=lambda x: [int(n) for n in x.split(",")],
+        default=[10, 100, 1000],
+        help="comma-separated numbers of datasets (default %(default)s)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=lambda x: [int(n) for n in x.split(",")],
+        default=[1, 4],
+        help="comma-separated worker counts (default %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="repetitions per measurement, the fastest is kept (default %(default)s)",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="run to compare against (default: the previous run in the results file)",
+    )
+    add_corpus_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    unknown = set(args.stages) - STAGES.keys()
+    if unknown:
+        print(f"Unknown stages: {sorted(unknown)}")
+        sys.exit(1)
+
+    runner = BenchmarkRunner(
+        work_dir=Path(args.work_dir),
+        results_path=Path(args.results),
+        config=corpus_config(args, n_datasets=0),
+        scales=args.scales,
+        workers=args.workers,
+        stages=args.stages,
+        repeat=args.repeat,
+    )
+    previous_runs = load_runs(runner.results_path)
+    run = runner.save(runner.run())
+    print(f"Saved results of run {run['run']} to {runner.results_path}")
+
+    if args.baseline is not None:
+        baselines = [r for r in previous_runs if r["run"] == args.baseline]
+        if not baselines:
+            print(f"Run {args.baseline} not found in {runner.results_path}")
+            sys.exit(1)
+        compare(run, baselines[0])
+    elif previous_runs:
+        compare(run, previous_runs[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import math
+from collections import Counter
+from dataclasses import dataclass, field, fields
+from typing import Any
+
+from dataset_scrapers.profile_index import NUMERIC_TYPES
+
+# buckets per power of two, so that quantiles are known within a factor of 2 ** (1 / 4)
+BUCKETS_PER_OCTAVE = 4
+
+
+@dataclass
+class Distribution:
+    """Mergeable summary of non-negative values.
+
+    Count, sum, minimum and maximum are exact. The values themselves are counted in logarithmic
+    buckets, so quantiles are approximate but the summary has a bounded size and two summaries
+    merge by adding their counters.
+    """
+
+    count: int = 0
+    total: float = 0.0
+    minimum: float = math.inf
+    maximum: float = 0.0
+    buckets: Counter[int] = field(default_factory=Counter)
+
+    @staticmethod
+    def bucket(value: float) -> int:
+        if value < 1:
+            return 0
+        return 1 + math.floor(BUCKETS_PER_OCTAVE * math.log2(value))
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.buckets[self.bucket(value)] += 1
+
+    def merge(self, other: Distribution) -> None:
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        self.buckets.update(other.buckets)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    def quantile(self, q: float) -> float:
+        """Return an upper bound of the `q`-quantile, exact up to the width of its bucket."""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                upper = 2 ** (bucket / BUCKETS_PER_OCTAVE) if bucket else 1.0
+                return min(max(upper, self.minimum), self.maximum)
+        return self.maximum
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "minimum": self.minimum if self.count else None,
+            "maximum": self.maximum,
+            "buckets": {str(bucket): n for bucket, n in sorted(self.buckets.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> Distribution:
+        return cls(
+            count=data["count"],
+            total=data["total"],
+            minimum=math.inf if data["minimum"] is None else data["minimum"],
+            maximum=data["maximum"],
+            buckets=Counter({int(bucket): n for bucket, n in data["buckets"].items()}),
+        )
+
+
+@dataclass
+class CorpusStats:
+    """Mergeable statistics of a corpus of enriched profiles and their errors.
+
+    Statistics of disjoint parts of a corpus, e.g. of chunks processed by different workers or
+    of shards enriched on different nodes, merge into the statistics of the whole corpus.
+    """
+
+    files_per_dataset: Distribution = field(default_factory=Distribution)
+    columns_per_file: Distribution = field(default_factory=Distribution)
+    profile_bytes: Distribution = field(default_factory=Distribution)
+    archive_bytes: Distribution = field(default_factory=Distribution)
+    column_types: Counter[str] = field(default_factory=Counter)
+    file_errors: Counter[str] = field(default_factory=Counter)
+    column_errors: Counter[str] = field(default_factory=Counter)
+
+    def add_dataset(self, facts: dict[str, Any]) -> None:
+        """Add a dataset described by the facts that `profile_facts` extracts from it."""
+        self.files_per_dataset.add(facts["files"])
+        for columns in facts["columns"]:
+            self.columns_per_file.add(columns)
+        self.profile_bytes.add(facts["profile_bytes"])
+        if facts["archive_bytes"] is not None:
+            self.archive_bytes.add(facts["archive_bytes"])
+        self.column_types.update(facts["types"])
+
+    def add_error(self, error: dict[str, Any]) -> None:
+        """Add a record of the error log of `enrich_profiles.py`."""
+        if error.get("mode") == "Column":
+            self.column_errors[error["type"]] += 1
+        else:
+            self.file_errors[error["type"]] += 1
+
+    def merge(self, other: CorpusStats) -> None:
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, Distribution):
+                value.merge(getattr(other, f.name))
+            else:
+                value.update(getattr(other, f.name))
+
+    @property
+    def numeric_columns(self) -> int:
+        return sum(
+            count
+            for data_type, count in self.column_types.items()
+            if data_type.lower() in NUMERIC_TYPES
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        data: dict[str, Any] = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            data[f.name] = value.to_dict() if isinstance(value, Distribution) else dict(value)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> CorpusStats:
+        stats = cls()
+        for f in fields(stats):
+            value = getattr(stats, f.name)
+            if isinstance(value, Distribution):
+                value.merge(Distribution.from_dict(data[f.name]))
+            else:
+                value.update(data[f.name])
+        return stats
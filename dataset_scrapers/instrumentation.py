@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import heapq
+import json
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+class StageTimer:
+    """Low-overhead wall-clock timers and counters for named pipeline stages."""
+
+    def __init__(self) -> None:
+        self.seconds: defaultdict[str, float] = defaultdict(float)
+        self.counters: Counter[str] = Counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def merge(self, seconds: dict[str, float], counters: dict[str, int]) -> None:
+        for name, value in seconds.items():
+            self.seconds[name] += value
+        self.counters.update(counters)
+
+
+class TopN:
+    """Keep the `n` largest items seen so far in a bounded heap."""
+
+    def __init__(self, n: int) -> None:
+        self.n = n
+        self.heap: list[tuple[float, int, dict[str, Any]]] = []
+        self.seen = 0
+
+    def add(self, value: float, item: dict[str, Any]) -> None:
+        # the counter breaks ties, so that the items themselves are never compared
+        entry = (value, self.seen, item)
+        self.seen += 1
+        if len(self.heap) < self.n:
+            heapq.heappush(self.heap, entry)
+        elif value > self.heap[0][0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def items(self) -> list[dict[str, Any]]:
+        return [item for _, _, item in sorted(self.heap, reverse=True)]
+
+
+class TimingReport:
+    """Aggregate stage timings across workers and track the slowest datasets, files and columns."""
+
+    def __init__(self, top_n: int = 20) -> None:
+        self.timer = StageTimer()
+        self.column_seconds: defaultdict[str, float] = defaultdict(float)
+        self.column_counts: Counter[str] = Counter()
+        self.datasets = TopN(top_n)
+        self.files = TopN(top_n)
+        self.columns = TopN(top_n)
+
+    def add_file(
+        self,
+        dataset: str,
+        file: str,
+        seconds: dict[str, float],
+        counters: dict[str, int],
+        columns: list[tuple[str, str, float]],
+    ) -> None:
+        self.timer.merge(seconds, counters)
+        self.files.add(
+            seconds.get("total", 0.0),
+            {"dataset": dataset, "file": file, "seconds": seconds, "counters": counters},
+        )
+        for name, data_type, elapsed in columns:
+            self.column_seconds[data_type] += elapsed
+            self.column_counts[data_type] += 1
+            self.columns.add(
+                elapsed,
+                {
+                    "dataset": dataset,
+                    "file": file,
+                    "column": name,
+                    "type": data_type,
+                    "seconds": elapsed,
+                },
+            )
+
+    def add_dataset(self, dataset: str, seconds: float, n_files: int) -> None:
+        self.datasets.add(seconds, {"dataset": dataset, "seconds": seconds, "files": n_files})
+
+    def to_dict(self, wall_time: float) -> dict[str, Any]:
+        return {
+            "wallTime": wall_time,
+            "stages": dict(sorted(self.timer.seconds.items(), key=lambda x: -x[1])),
+            "counters": dict(self.timer.counters),
+            "columnTypes": {
+                data_type: {"seconds": seconds, "columns": self.column_counts[data_type]}
+                for data_type, seconds in sorted(self.column_seconds.items(), key=lambda x: -x[1])
+            },
+            "slowestDatasets": self.datasets.items(),
+            "slowestFiles": self.files.items(),
+            "slowestColumns": self.columns.items(),
+        }
+
+    def write(self, path: Path, wall_time: float) -> None:
+        path.write_text(json.dumps(self.to_dict(wall_time), indent=2), encoding="utf-8")
+
+    def summary(self) -> str:
+        stages = ", ".join(
+            f"{name} {seconds:.1f}s"
+            for name, seconds in sorted(self.timer.seconds.items(), key=lambda x: -x[1])
+        )
+        counters = self.timer.counters
+        return (
+            f"Stage times (summed over workers): {stages}\n"
+            f"Read {counters['bytesRead'] / 1024**2:.1f} MB, parsed {counters['rowsParsed']} rows"
+        )
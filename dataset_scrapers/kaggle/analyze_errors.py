@@ -1,14 +1,15 @@
 import argparse
-from collections import Counter
 from pathlib import Path
 
+import pandas as pd
+from pandas import Series
 
-def analyze_most_common(strings: list[str], n: int = 10) -> None:
-    counter = Counter(strings)
-    total = sum(counter.values())
-    most_common = [(category, count, count / total) for category, count in counter.most_common(n)]
-    for category, count_abs, count_rel in most_common:
-        print(f"{category}: {count_abs} occurrences ({count_rel:.2%})")
+
+def analyze_most_common(errors: Series, n: int = 10) -> None:
+    counts = errors.value_counts()
+    total = counts.sum()
+    for category, count_abs in counts.head(n).items():
+        print(f"{category}: {count_abs} occurrences ({count_abs / total:.2%})")
 
 
 def parse_args() -> argparse.Namespace:
@@ -16,8 +17,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--error-path",
         type=str,
-        default="../error_list.log",
-        help="path to error_list.log (default %(default)s)",
+        default="../error_list.jsonl",
+        help="path to error_list.jsonl (default %(default)s)",
     )
     return parser.parse_args()
 
@@ -25,22 +26,15 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
 
-    error_path = Path(args.error_path)
-    column_errors: list[str] = []
-    file_errors: list[str] = []
-
-    with Path.open(error_path, "r") as f:
-        for line in f:
-            error = line.strip()
-            parts = error.split(";")
-            if parts[0] == "Column":
-                column_errors.append(parts[1])
-            else:
-                file_errors.append(parts[1])
+    errors = pd.read_json(Path(args.error_path), lines=True, dtype={"column": "string"})
+    if errors.empty:
+        print("No errors recorded.")
+        return
+    is_column = errors["mode"] == "Column"
     print("Column errors:")
-    analyze_most_common(column_errors)
+    analyze_most_common(errors.loc[is_column, "type"])
     print("\nFile errors:")
-    analyze_most_common(file_errors)
+    analyze_most_common(errors.loc[~is_column, "type"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+from pathlib import Path, PurePosixPath
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlparse
+
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from dataset_scrapers.profile_index import ProfileIndexWriter
+from dataset_scrapers.serialization import column_rows, table_files
+from dataset_scrapers.sharding import ref_of
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def load_rows(path: Path) -> list[dict[str, Any]]:
+    """Flatten the column profiles of an enriched croissant file.
+
+    Datasets are named by their ref, like in the column profile table. Profiles without a
+    `kaggleRef` take it from the last two parts of their Kaggle `url`.
+    """
+    metadata = json.loads(path.read_text(encoding="utf-8"))
+    ref = metadata.get("kaggleRef") or ref_of(PurePosixPath(urlparse(metadata["url"]).path))
+    return column_rows(ref, metadata)
+
+
+class IndexBuilder:
+    """Build a `ProfileIndex` from the output of `enrich_profiles.py`.
+
+    The column profile table is read batch by batch if it exists. Otherwise, the enriched
+    croissant files are parsed in parallel and added in a fixed order.
+    """
+
+    def __init__(
+        self, source_dir: Path, output_dir: Path, n_bins: int, bands: int, workers: int
+    ) -> None:
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.n_bins = n_bins
+        self.bands = bands
+        self.workers = workers
+
+    def rows(self) -> Iterator[list[dict[str, Any]]]:
+        table = self.source_dir / "column_profiles.parquet"
+        if table.exists():
+            # the table is a directory with one part per batch if it was enriched with --serve
+            paths = table_files(table)
+            total = sum(pq.read_metadata(path).num_rows for path in paths)
+            with tqdm(total=total, desc="Indexing columns") as progress:
+                for path in paths:
+                    for batch in pq.ParquetFile(path).iter_batches(batch_size=100_000):
+                        progress.update(batch.num_rows)
+                        yield batch.to_pylist()
+            return
+        paths = sorted(self.source_dir.glob("*.json"))
+        with mp.Pool(self.workers) as pool:
+            yield from tqdm(
+                pool.imap(load_rows, paths, chunksize=16),
+                total=len(paths),
+                desc="Indexing datasets",
+            )
+
+    def start(self) -> int:
+        writer = ProfileIndexWriter(self.output_dir, n_bins=self.n_bins, bands=self.bands)
+        for rows in self.rows():
+            writer.add(rows)
+        writer.close()
+        return writer.count
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="build a search index over column profiles")
+    parser.add_argument(
+        "--source",
+        type=str,
+        default=(BASE_DIR / "../croissant"),
+        help="path to the enriched profiles (default %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=(BASE_DIR / "../profile_index"),
+        help="path to the index directory (default %(default)s)",
+    )
+    parser.add_argument(
+        "--bins",
+        type=int,
+        default=16,
+        help="number of bins that histograms are resampled to for similarity queries "
+        "(default %(default)s)",
+    )
+    parser.add_argument(
+        "--bands",
+        type=int,
+        default=32,
+        help="number of LSH bands that MinHash signatures are split into for join queries; "
+        "more bands find columns with less overlap (default %(default)s)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=mp.cpu_count(),
+        help="number of processes that parse enriched croissant files (default %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    start = time.perf_counter()
+    args = parse_args()
+    source_dir = Path(args.source)
+    if not source_dir.exists():
+        print("This program requires a directory with enriched croissant metadata to work!")
+        sys.exit(1)
+
+    builder = IndexBuilder(source_dir, Path(args.output), args.bins, args.bands, args.workers)
+    count = builder.start()
+    print(f"Indexed {count} columns in {time.perf_counter() - start:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
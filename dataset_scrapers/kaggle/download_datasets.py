@@ -1,16 +1,25 @@
 import argparse
 import contextlib
+import io
 import json
 import operator
+import os
 import sys
+import zipfile
 from collections.abc import Generator
+from functools import cached_property
 from pathlib import Path
-from typing import TextIO
+from typing import TYPE_CHECKING, TextIO
 
 import tqdm
-from kaggle.api.kaggle_api_extended import KaggleApi
 from tqdm.contrib import DummyTqdmFile
 
+from dataset_scrapers.retrying_session import RetryingSession
+from dataset_scrapers.sharding import Shard, add_shard_argument, ref_of
+
+if TYPE_CHECKING:
+    from kaggle.api.kaggle_api_extended import KaggleApi
+
 
 @contextlib.contextmanager
 def redirect_to_tqdm() -> Generator[TextIO]:
@@ -23,13 +32,27 @@ def redirect_to_tqdm() -> Generator[TextIO]:
 
 
 class DatasetDownloader:
-    def __init__(self, metadata_dir: Path, start_index: int = 0) -> None:
+    def __init__(
+        self,
+        metadata_dir: Path,
+        start_index: int = 0,
+        base_url: str | None = None,
+        max_retries: int = 3,
+        shard: Shard | None = None,
+    ) -> None:
         self.metadata_dir = metadata_dir
         self.start_index = start_index
+        self.shard = shard
+        self.base_url = None if base_url is None else base_url.rstrip("/")
         self.total_size = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.skipped = 0
 
-        self.api = KaggleApi()
-        self.api.authenticate()
+        auth = None
+        if "KAGGLE_USERNAME" in os.environ and "KAGGLE_KEY" in os.environ:
+            auth = (os.environ["KAGGLE_USERNAME"], os.environ["KAGGLE_KEY"])
+        self.session = RetryingSession(max_retries=max_retries, timeout=300, auth=auth)
 
         # NOTE: This could be moved to a utils file
         self.unit_multipliers = {
@@ -47,6 +70,15 @@ class DatasetDownloader:
 
         return float(parts[0]) * self.unit_multipliers[parts[1]]
 
+    @cached_property
+    def api(self) -> "KaggleApi":
+        # importing kaggle authenticates, so only do it when the API is needed
+        from kaggle.api import kaggle_api_extended  # noqa: PLC0415
+
+        api = kaggle_api_extended.KaggleApi()
+        api.authenticate()
+        return api
+
     def conditions_fullfilled(
         self, path: Path, max_size: float = 100.0
     ) -> tuple[bool, float | None]:
@@ -70,12 +102,36 @@ class DatasetDownloader:
 
     def download_dataset(self, path: Path) -> None:
         ref = "/".join(path.parts[-2:])
-        self.api.dataset_download_files(ref, path=str(path), unzip=True)
+        if self.base_url is None:
+            self.api.dataset_download_files(ref, path=str(path), unzip=True)
+            return
+        # the REST endpoint behind the Kaggle client, e.g. served by a local stand-in
+        response = self.session.get(f"{self.base_url}/api/v1/datasets/download/{ref}")
+        response.raise_for_status()
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            archive.extractall(path)
+
+    def download_if_missing(self, path: Path) -> bool:
+        """Download the dataset of a metadata file unless it exists and return if it exists now."""
+        # check if dataset is already downloaded
+        if len(list(path.parent.iterdir())) > 1:
+            self.skipped += 1
+            return True
+        try:
+            self.download_dataset(path.parent)
+        except Exception as e:  # noqa: BLE001
+            print(f"Exception occurred with {path}: {e}")
+            self.failed += 1
+            return False
+        self.downloaded += 1
+        return True
 
     def start(self) -> None:
         download_list: list[tuple[Path, float]] = []
         # create list of datasets to download
         for path in self.metadata_dir.rglob("croissant_metadata.json"):
+            if self.shard is not None and not self.shard.owns(ref_of(path.parent)):
+                continue
             self.total_size += 1
             # filter datasets by conditions
             try:
@@ -99,20 +155,15 @@ class DatasetDownloader:
                 if progress.n < self.start_index:
                     progress.update(1)
                     continue
-                # check if dataset is already downloaded
-                if len(list(path.parent.iterdir())) > 1:
-                    progress.update(1)
-                    continue
-                try:
-                    self.download_dataset(path.parent)
-                except Exception as e:  # noqa: BLE001
-                    print(f"Exception occurred with {path}: {e}")
+                self.download_if_missing(path)
                 progress.update(1)
 
         print(
             f"{n_downloads} datasets downloaded or cached "
             f"({round(n_downloads / self.total_size * 100, 2)}%)."
         )
+        if self.session.retries:
+            print(self.session.summary())
 
 
 def parse_args() -> argparse.Namespace:
@@ -130,6 +181,21 @@ def parse_args() -> argparse.Namespace:
         default=0,
         help="start index to continue downloading (default %(default)s)",
     )
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default=None,
+        help="download archives from this base URL instead of using the Kaggle client, "
+        "e.g. a local server (default: Kaggle client)",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="retries per download with --base-url after rate limits, server errors and "
+        "truncated responses (default %(default)s)",
+    )
+    add_shard_argument(parser)
     return parser.parse_args()
 
 
@@ -141,7 +207,13 @@ def main() -> None:
         print("This program requires a directory with croissant metadata to work!")
         sys.exit(1)
 
-    downloader = DatasetDownloader(metadata_dir, start_index=args.start_index)
+    downloader = DatasetDownloader(
+        metadata_dir,
+        start_index=args.start_index,
+        base_url=args.base_url,
+        max_retries=args.max_retries,
+        shard=args.shard,
+    )
     downloader.start()
 
 
@@ -1,45 +1,73 @@
 import argparse
 import json
 import re
-import sys
 import time
+from functools import cached_property
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import pandas as pd
 import requests
 import tqdm
-from kaggle.api.kaggle_api_extended import KaggleApi
 
+from dataset_scrapers.retrying_session import RetryingSession
+from dataset_scrapers.sharding import Shard, add_shard_argument
 from dataset_scrapers.task_queue import TaskQueue
 
+if TYPE_CHECKING:
+    from kaggle.api.kaggle_api_extended import KaggleApi
+
+KAGGLE_URL = "https://www.kaggle.com"
+
 
 class MetadataDownloader:
     def __init__(
-        self, data_dir: Path, output_dir: Path, max_pages: int = 100, num_workers: int = 1
+        self,
+        data_dir: Path,
+        output_dir: Path,
+        max_pages: int = 100,
+        num_workers: int = 1,
+        base_url: str = KAGGLE_URL,
+        max_retries: int = 3,
+        request_delay: float = 0.1,
+        shard: Shard | None = None,
     ) -> None:
         self.data_dir = data_dir
         self.output_dir = output_dir
         self.max_pages = max_pages
         self.max_workers = num_workers
+        self.base_url = base_url.rstrip("/")
+        self.request_delay = request_delay
+        self.shard = shard
         self.metadata_count = 0
         self.error_count = 0
         self.total_size = 0
+        self.rate_limited = False
+
+        self.session = RetryingSession(max_retries=max_retries)
+
+    @cached_property
+    def api(self) -> "KaggleApi":
+        # importing kaggle authenticates, so only do it when the API is needed
+        from kaggle.api import kaggle_api_extended  # noqa: PLC0415
 
-        self.api = KaggleApi()
-        self.api.authenticate()
+        api = kaggle_api_extended.KaggleApi()
+        api.authenticate()
+        return api
 
     def start(self, keyword: str, start_index: int) -> None:
+        refs = self.get_refs(keyword)
+        if self.shard is not None:
+            refs = self.shard.select(refs)
+        self.collect_metadata(start_index, refs)
+        self.print_stats()
+
+    def get_refs(self, keyword: str) -> list[str]:
         if keyword:
             self.download_meta_kaggle_dataset()
             self.create_username_slug()
-            refs = self.read_refs_from_file()
-        else:
-            refs = self.search_kaggle_datasets(keyword)
-
-        self.total_size = len(refs)
-        self.collect_metadata(start_index, refs)
-        self.print_stats()
+            return self.read_refs_from_file()
+        return self.search_kaggle_datasets(keyword)
 
     def download_meta_kaggle_dataset(self) -> None:
         ref = "kaggle/meta-kaggle"
@@ -112,8 +140,11 @@ class MetadataDownloader:
             return []
 
     def get_croissant_metadata(self, ref: str) -> tuple[dict[str, Any] | Exception | int, int]:
-        url = "https://www.kaggle.com/datasets/" + ref + "/croissant/download"
-        response = requests.get(url, timeout=20)
+        url = f"{self.base_url}/datasets/{ref}/croissant/download"
+        try:
+            response = self.session.get(url)
+        except requests.RequestException as e:
+            return e, -2
         if response.status_code == 200:  # noqa: PLR2004
             try:
                 result: dict[str, Any] = json.loads(response.content.decode("utf-8"))
@@ -129,45 +160,59 @@ class MetadataDownloader:
     def sanitize_filename(self, filename: str) -> str:
         return re.sub(r'[<>:"/\\|?*]', "_", filename)
 
-    def save_metadata(self, metadata: dict[str, Any]) -> None:
+    def save_metadata(self, metadata: dict[str, Any]) -> Path:
         dirname = f"{metadata['kaggleRef']}"
         dirpath = self.output_dir / dirname
         dirpath.mkdir(exist_ok=True, parents=True)
         with Path.open(dirpath / "croissant_metadata.json", "w") as json_file:
             json.dump(metadata, json_file, indent=4)
+        return dirpath / "croissant_metadata.json"
 
-    def process_ref(self, ref: str, progress: tqdm.tqdm) -> None:
+    def fetch_ref(self, ref: str, progress: int = 0) -> Path | None:
+        """Download and save the metadata of a ref and return its path, or `None` on failure."""
+        if self.rate_limited:
+            return None
         result, status = self.get_croissant_metadata(ref)
         if status == 0 and isinstance(result, dict):
             result["kaggleRef"] = ref
-            self.save_metadata(result)
             self.metadata_count += 1
-        elif status == -1:
-            print(f"Got 'Too many requests' at progress {progress.n}, exiting ...")
-            self.print_stats()
-            sys.exit(0)
-        else:
-            with Path.open(self.data_dir / "error_datasets.txt", "a") as file:
-                file.write(f"{ref},{result}\n")
-            self.error_count += 1
-        progress.update(1)
+            return self.save_metadata(result)
+        if status == -1:
+            # stop after the retries ran out; exiting here would only end this worker thread
+            if not self.rate_limited:
+                print(f"Got 'Too many requests' at progress {progress}, stopping ...")
+            self.rate_limited = True
+            return None
+        with Path.open(self.data_dir / "error_datasets.txt", "a") as file:
+            file.write(f"{ref},{result}\n")
+        self.error_count += 1
+        return None
+
+    def process_ref(self, ref: str, progress: tqdm.tqdm) -> None:
+        if self.fetch_ref(ref, progress.n) is not None or not self.rate_limited:
+            progress.update(1)
 
     def collect_metadata(self, start_index: int, refs: list[str]) -> None:
+        self.total_size = len(refs)
         queue = TaskQueue(self.max_workers)
 
         with tqdm.tqdm(total=self.total_size, desc="Processing datasets") as progress:
-            for ref in refs:
-                if progress.n < start_index:
+            for i, ref in enumerate(refs):
+                if i < start_index:
                     progress.update(1)
                     continue
+                if self.rate_limited:
+                    break
                 queue.add_task(self.process_ref, ref=ref, progress=progress)
-                time.sleep(0.1)
+                time.sleep(self.request_delay)
             queue.join()
 
     def print_stats(self) -> None:
         print(f"{self.metadata_count} metadata collected.")
         print(f"{self.error_count} errors occurred")
         print(f"{round(100 * self.metadata_count / self.total_size, 2)}% downloaded")
+        if self.session.retries:
+            print(self.session.summary())
 
 
 def parse_args() -> argparse.Namespace:
@@ -211,6 +256,26 @@ def parse_args() -> argparse.Namespace:
         help="number of parallel workers used to download metadata (default %(default)s)",
         default=1,
     )
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default=KAGGLE_URL,
+        help="base URL of the croissant endpoint, e.g. a local server (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="retries per request after rate limits, server errors and truncated "
+        "responses (default %(default)s)",
+    )
+    parser.add_argument(
+        "--request-delay",
+        type=float,
+        default=0.1,
+        help="delay in seconds between submitting requests (default %(default)s)",
+    )
+    add_shard_argument(parser)
     return parser.parse_args()
 
 
@@ -223,7 +288,14 @@ def main() -> None:
     output_dir.mkdir(exist_ok=True, parents=True)
 
     downloader = MetadataDownloader(
-        data_dir, output_dir, max_pages=args.max_pages, num_workers=args.workers
+        data_dir,
+        output_dir,
+        max_pages=args.max_pages,
+        num_workers=args.workers,
+        base_url=args.base_url,
+        max_retries=args.max_retries,
+        request_delay=args.request_delay,
+        shard=args.shard,
     )
     downloader.start(keyword=args.keyword, start_index=args.start_index)
 
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from multiprocessing.connection import Client
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="send a batch of datasets to a running enrich_profiles.py --serve"
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=(BASE_DIR / "../enrich.sock"),
+        help="path to the socket of the enrichment server (default %(default)s)",
+    )
+    parser.add_argument(
+        "--source",
+        type=str,
+        default=(BASE_DIR / "../kaggle_metadata"),
+        help="path to the metadata of the batch (default %(default)s)",
+    )
+    parser.add_argument(
+        "--stop",
+        action="store_true",
+        help="stop the server instead of sending a batch",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    start = time.perf_counter()
+    args = parse_args()
+    socket_path = Path(args.socket)
+    if not socket_path.exists():
+        print("This program requires a server started with enrich_profiles.py --serve to work!")
+        sys.exit(1)
+
+    if args.stop:
+        request = {"command": "stop"}
+    else:
+        source_dir = Path(args.source).resolve()
+        if not source_dir.exists():
+            print("This program requires a directory with croissant metadata to work!")
+            sys.exit(1)
+        # the server may run in another working directory
+        request = {"command": "enrich", "source": str(source_dir)}
+    with Client(str(socket_path), family="AF_UNIX") as connection:
+        connection.send(request)
+        summary = connection.recv()
+    print(json.dumps(summary))
+    print(f"Finished in {time.perf_counter() - start:.2f} seconds.")
+    if "error" in summary:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
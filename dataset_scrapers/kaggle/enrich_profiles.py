@@ -1,15 +1,24 @@
 from __future__ import annotations
 
 import argparse
+import contextlib
+import cProfile
+import hashlib
 import json
-import math
 import multiprocessing as mp
+import operator
+import os
+import pstats
+import shutil
 import sys
+import threading
 import time
+from collections import Counter
+from dataclasses import dataclass, field
 from enum import Enum
+from multiprocessing.connection import Listener
 from pathlib import Path
 from typing import TYPE_CHECKING, Any
-from urllib.parse import unquote
 
 import cchardet
 import numpy as np
@@ -17,12 +26,60 @@ import pandas as pd
 from pandas import Series
 from tqdm import tqdm
 
+from dataset_scrapers.instrumentation import StageTimer, TimingReport
+from dataset_scrapers.kaggle.file_index import (
+    AmbiguousFileError,
+    FileIndex,
+    UnresolvedFileError,
+    list_files,
+)
+from dataset_scrapers.profile_cache import ProfileCache
+from dataset_scrapers.serialization import ColumnTableWriter, dump_json, supersede_rows, to_json
+from dataset_scrapers.sharding import Shard, add_shard_argument, ref_of
+from dataset_scrapers.sketches import MinHash, count_values, hash_values
+from dataset_scrapers.supervised_pool import (
+    MemoryLimitError,
+    SupervisedPool,
+    TaskTimeoutError,
+    WorkerCrashedError,
+    available_memory,
+)
+
 if TYPE_CHECKING:
-    from multiprocessing.sharedctypes import Synchronized
+    from collections.abc import Iterable, Iterator
+
+
+class ErrorBuffer(threading.local):
+    """Errors of the current thread, drained into the results that are sent to the parent.
+
+    Each thread has a buffer of its own, since the feeder thread and the main thread of the
+    parent log and drain errors at the same time.
+    """
+
+    def __init__(self) -> None:
+        self.errors: list[dict[str, Any]] = []
+
 
-error_count: Synchronized[int]
+profile_cache: ProfileCache | None = None
+# the creator of the current worker process, set once by the pool initializer
+worker_creator: HistogramCreator | None = None
+error_buffer = ErrorBuffer()
 
 BASE_DIR = Path(__file__).parent
+# bump whenever the profiling output changes to invalidate cached profiles
+PROFILE_VERSION = 3
+# rough ratio between the memory pandas needs for a CSV file and its size on disk
+CSV_MEMORY_FACTOR = 10
+# errors of tasks that were killed by the pool supervisor
+KILL_ERRORS = {e.__name__ for e in (TaskTimeoutError, MemoryLimitError, WorkerCrashedError)}
+# modules that the fork server imports once, so that workers start without importing them again
+PRELOAD_MODULES = [
+    "numpy",
+    "pandas",
+    "cchardet",
+    "pyarrow.parquet",
+    "tqdm",
+]
 
 
 class ErrorType(Enum):
@@ -31,10 +88,146 @@ class ErrorType(Enum):
     Dataset = 2
 
 
-def init_workers(counter: Synchronized[int]) -> None:
-    """Initialize each worker with a global synchronized counter."""
-    global error_count  # noqa: PLW0603
-    error_count = counter
+def set_start_method(method: str) -> None:
+    """Set how worker processes are started and preload heavy modules for `forkserver`."""
+    mp.set_start_method(method)
+    if method == "forkserver":
+        mp.set_forkserver_preload(PRELOAD_MODULES)
+
+
+def init_workers(creator: HistogramCreator) -> None:
+    """Initialize each worker with the creator and its profile cache."""
+    global profile_cache, worker_creator  # noqa: PLW0603
+    worker_creator = creator
+    profile_cache = creator.cache
+
+
+def process_file(task: FileTask) -> FileResult:
+    """Profile a record file with the creator of the current worker."""
+    assert worker_creator is not None, "Worker was not initialized"
+    return worker_creator.process_file(task)
+
+
+def drain_errors() -> list[dict[str, Any]]:
+    """Return and clear the errors collected by the current thread."""
+    errors, error_buffer.errors = error_buffer.errors, []
+    return errors
+
+
+def strike_key(dataset: Path | str, file: Path | str) -> str:
+    """Return the key of a file in the quarantine table (`<user>/<dataset>/<path in dataset>`).
+
+    The key does not depend on where the corpus is stored, so strikes survive moving the corpus
+    and apply to batches of a server that come from different source directories.
+    """
+    dataset = Path(dataset)
+    return f"{ref_of(dataset)}/{Path(file).relative_to(dataset).as_posix()}"
+
+
+class QuarantinedFileError(RuntimeError):
+    pass
+
+
+class MissingResultError(RuntimeError):
+    pass
+
+
+class ErrorLog:
+    """Collect error records and append them to a JSON Lines table in batches.
+
+    The table only holds the errors of the current run, or of all batches of a server if later
+    batches `append` to it. Files whose tasks were killed are also counted in a quarantine table
+    next to it (`<name>.quarantine.jsonl`, one record per `strike_key` with its `strikes`), so
+    that files which repeatedly stall or exhaust workers can be skipped across runs. The strikes
+    of a file are cleared once it completes.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 1000, append: bool = False) -> None:
+        self.path = path
+        self.quarantine_path = path.with_name(f"{path.stem}.quarantine.jsonl")
+        self.batch_size = batch_size
+        self.count = 0
+        self.types: Counter[str] = Counter()
+        self.buffer: list[dict[str, Any]] = []
+        self.lock = threading.Lock()
+        # killed attempts per file in earlier runs, and files killed or completed in this run
+        self.strikes: Counter[str] = Counter()
+        self.killed: Counter[str] = Counter()
+        self.completed: set[str] = set()
+        if self.quarantine_path.exists():
+            with self.quarantine_path.open(encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.strikes[record["file"]] = record["strikes"]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not append:
+            self.path.write_text("", encoding="utf-8")
+
+    def add(self, errors: list[dict[str, Any]]) -> None:
+        with self.lock:
+            self.buffer.extend(errors)
+            self.count += len(errors)
+            self.types.update(error["type"] for error in errors)
+            self.killed.update(
+                strike_key(error["dataset"], error["file"])
+                for error in errors
+                if error["type"] in KILL_ERRORS
+            )
+            if len(self.buffer) >= self.batch_size:
+                self._write()
+
+    def complete(self, key: str) -> None:
+        """Clear the strikes of a file whose task completed, once the log is flushed."""
+        with self.lock:
+            if key in self.strikes:
+                self.completed.add(key)
+
+    def flush(self) -> None:
+        with self.lock:
+            self._write()
+            if self.killed or self.completed:
+                self._write_quarantine()
+
+    def _write_quarantine(self) -> None:
+        for key in self.completed:
+            del self.strikes[key]
+        self.strikes.update(self.killed)
+        self.killed = Counter()
+        self.completed = set()
+        temp_path = self.quarantine_path.with_suffix(".tmp")
+        with temp_path.open("w", encoding="utf-8") as file:
+            file.writelines(
+                json.dumps({"file": key, "strikes": strikes}, ensure_ascii=False) + "\n"
+                for key, strikes in sorted(self.strikes.items())
+            )
+        temp_path.replace(self.quarantine_path)
+
+    def _write(self) -> None:
+        with self.path.open("a", encoding="utf-8") as file:
+            file.writelines(json.dumps(error, ensure_ascii=False) + "\n" for error in self.buffer)
+        self.buffer = []
+
+
+@dataclass
+class FileTask:
+    dataset: Path
+    record: int
+    path: Path
+    size: int
+    fields: list[dict[str, Any]]
+
+
+@dataclass
+class FileResult:
+    dataset: Path
+    record: int
+    fields: list[dict[str, Any]]
+    errors: list[dict[str, Any]]
+    cached: bool = False
+    timer: StageTimer = field(default_factory=StageTimer)
+    # name, data type and seconds of each profiled column
+    columns: list[tuple[str, str, float]] = field(default_factory=list)
 
 
 class HistogramCreator:
@@ -42,18 +235,43 @@ class HistogramCreator:
         self,
         source_dir: Path,
         target_dir: Path,
-        error_dir: Path,
+        error_log: Path,
         max_count: int,
         bin_count: int = 10,
         workers: int = mp.cpu_count(),
+        approx_threshold: int | None = None,
+        cache: ProfileCache | None = None,
+        output_format: str = "json",
+        indent: int | None = None,
+        task_timeout: float | None = None,
+        max_rss: int | None = None,
+        max_tasks_per_child: int | None = None,
+        memory_fraction: float = 0.8,
+        max_strikes: int = 2,
+        report_path: Path | None = None,
+        top_n: int = 20,
+        shard: Shard | None = None,
+        minhash_size: int | None = None,
     ) -> None:
         self.source_dir = source_dir
         self.target_dir = target_dir
-        self.error_dir = error_dir
+        self.error_log = error_log
         self.max_count = max_count
         self.bin_count = bin_count
         self.num_processes = workers
-        self.error_dir.mkdir(parents=True, exist_ok=True)
+        self.approx_threshold = approx_threshold
+        self.cache = cache
+        self.output_format = output_format
+        self.indent = indent
+        self.task_timeout = task_timeout
+        self.max_rss = max_rss
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_fraction = memory_fraction
+        self.max_strikes = max_strikes
+        self.report_path = report_path
+        self.top_n = top_n
+        self.shard = shard
+        self.minhash_size = minhash_size
 
     def analyze_csv_file(self, path: Path, n_columns: int) -> tuple[str, str]:
         """Analyze a CSV file and return its encoding and separator."""
@@ -73,24 +291,6 @@ class HistogramCreator:
 
         return encoding, separator
 
-    def sanitize_json(self, obj: Any) -> Any:  # noqa: ANN401
-        if isinstance(obj, float):
-            if math.isnan(obj) or pd.isna(obj):
-                return "NaN"
-            if math.isinf(obj):
-                return None
-            return obj
-        if isinstance(obj, dict):
-            # check for infs in keys
-            if any(isinstance(k, float) and (math.isinf(k) or math.isnan(k)) for k in obj):
-                return {}
-            return {k: self.sanitize_json(v) for k, v in obj.items()}
-        if isinstance(obj, list):
-            return [self.sanitize_json(item) for item in obj]
-        if isinstance(obj, tuple):
-            return tuple(self.sanitize_json(item) for item in obj)
-        return obj
-
     def calculate_usability(self, metadata: dict[str, Any]) -> float:
         score = 0
         max_score = 6
@@ -116,16 +316,30 @@ class HistogramCreator:
             break
         return round(score / max_score, 2)
 
+    def add_minhash(self, column: dict[str, Any], minhash: MinHash) -> None:
+        signature = minhash.signature()
+        if signature is not None:
+            column["minhash"] = signature
+
     def process_numerical(self, data: Series, column: dict[str, Any]) -> None:
+        values = data
         if data.dtype == "object":
             try:
                 # catch case where 1923423 = "1,923,423"
                 # NOTE: This causes issues with German-style decimal separators
                 data = data.str.replace(",", "").astype(float)
+                values = data
             except Exception:  # noqa: BLE001
                 # map strings to numbers
                 mapping = {string: idx for idx, string in enumerate(data.unique())}
                 data = Series([mapping[item] for item in data])
+        if self.minhash_size is not None:
+            minhash = MinHash(self.minhash_size)
+            # hash numbers as floats, so that integer columns can join float columns
+            if pd.api.types.is_numeric_dtype(values):
+                values = values.astype(np.float64)
+            minhash.update(hash_values(values))
+            self.add_minhash(column, minhash)
         # create histogram
         densities, bins = np.histogram(
             data, density=True, bins=min(data.nunique(), self.bin_count)
@@ -150,14 +364,19 @@ class HistogramCreator:
         column["statistics"] = statistics
 
     def process_text(self, data: Series, column: dict[str, Any]) -> None:
-        n_unique = data.nunique()
-        top_10 = data.value_counts().head(10).to_dict()
-        column["nUnique"] = n_unique
-        column["mostCommon"] = top_10
+        # distinct count, top 10 and the MinHash signature come from a single hashed pass
+        minhash = None if self.minhash_size is None else MinHash(self.minhash_size)
+        counts = count_values(data, top_n=10, capacity=self.approx_threshold, minhash=minhash)
+        column["nUnique"] = counts.n_unique
+        column["mostCommon"] = counts.most_common
+        if not counts.exact:
+            column["approximate"] = True
+        if minhash is not None:
+            self.add_minhash(column, minhash)
 
     def process_bool(self, data: Series, column: dict[str, Any]) -> None:
-        counts = data.value_counts().to_dict()
-        column["counts"] = counts
+        counts = count_values(data, top_n=None)
+        column["counts"] = counts.most_common
 
     def process_date(self, data: Series, column: dict[str, Any]) -> None:
         # NOTE: Using mixed format is risky and can lead to false date parsing
@@ -174,17 +393,25 @@ class HistogramCreator:
         column["maxDate"] = max_date.isoformat()
         column["uniqueDates"] = unique_dates
 
-    def handle_exception(self, path: Path, e: Exception, mode: int) -> None:
+    def handle_exception(
+        self,
+        path: Path,
+        e: Exception,
+        mode: int,
+        file: Path | None = None,
+        column: str | None = None,
+    ) -> None:
         print(f"Error occurred with {path}: {e}", flush=True)
-        with error_count.get_lock():
-            error_id = error_count.value
-            error_count.value += 1
-        mode_header = ErrorType(mode).name
-        filename = self.error_dir / f"error_{error_id}.log"
-        with Path.open(filename, "w") as f:
-            f.write(
-                mode_header + ";" + str(type(e).__name__) + ";" + str(e).strip() + ";" + str(path)
-            )
+        error_buffer.errors.append(
+            {
+                "mode": ErrorType(mode).name,
+                "type": type(e).__name__,
+                "message": str(e).strip(),
+                "dataset": str(path),
+                "file": None if file is None else str(file),
+                "column": column,
+            }
+        )
 
     def get_file_paths(self, metadata: dict[str, Any]) -> list[Path]:
         """Get all file paths from the metadata."""
@@ -197,8 +424,13 @@ class HistogramCreator:
                     paths.append(path)
         return paths
 
-    def process_dataset(self, path: Path) -> None:  # noqa: C901
-        # open metadata file
+    def load_dataset(
+        self, path: Path, files: tuple[list[str], list[int]] | None = None
+    ) -> tuple[dict[str, Any], list[FileTask]] | None:
+        """Load the metadata of a dataset and split it into one task per record file.
+
+        The `files` of the dataset as returned by `list_files` are scanned if not given.
+        """
         metadata_path = path / "croissant_metadata.json"
         with metadata_path.open(encoding="utf-8") as file:
             metadata: dict[str, Any] = json.load(file)
@@ -208,120 +440,485 @@ class HistogramCreator:
             assert len(paths) == len(records), "Number of csv paths and records do not match"
         except AssertionError as e:
             self.handle_exception(path, e, 2)
-            return
+            return None
         # calculate usability
         score = self.calculate_usability(metadata)
         metadata["usability"] = score
-        # iterate through each file
+
+        index = FileIndex.scan(path) if files is None else FileIndex(path, *files)
+        tasks: list[FileTask] = []
         for i, file_record in enumerate(records):
             try:
-                filepath = paths[i]
-                csv_file = path / filepath
-                if not csv_file.exists():
-                    # fallback to old method
-                    csv_file = path / unquote(
-                        file_record["@id"].replace("+", " ").replace("/", "_")
-                    )
-                encoding, separator = self.analyze_csv_file(csv_file, len(file_record["field"]))
+                csv_file = index.resolve(str(paths[i]), file_record["@id"])
+            except (AmbiguousFileError, UnresolvedFileError) as e:
+                self.handle_exception(path, e, 0, file=paths[i])
+                continue
+            tasks.append(FileTask(path, i, csv_file, index.size(csv_file), file_record["field"]))
+        return metadata, tasks
+
+    def profile_key(self, task: FileTask) -> str:
+        """Hash the file content together with everything else that determines its profile."""
+        digest = hashlib.blake2b(digest_size=20)
+        with task.path.open("rb") as file:
+            while chunk := file.read(2**20):
+                digest.update(chunk)
+        data_types = [column.get("dataType") for column in task.fields]
+        spec = [
+            PROFILE_VERSION,
+            self.bin_count,
+            self.approx_threshold,
+            self.minhash_size,
+            data_types,
+        ]
+        digest.update(json.dumps(spec).encode())
+        return digest.hexdigest()
+
+    def process_file(self, task: FileTask) -> FileResult:
+        """Profile all columns of a single record file and time each stage."""
+        timer = StageTimer()
+        with timer.stage("total"):
+            result = self.profile_file(task, timer)
+        result.timer = timer
+        return result
+
+    def profile_file(self, task: FileTask, timer: StageTimer) -> FileResult:
+        """Profile all columns of a single record file, using the profile cache if enabled."""
+        key = None
+        if profile_cache is not None and task.path.is_file():
+            with timer.stage("hash"):
+                key = self.profile_key(task)
+            timer.count("bytesHashed", task.size)
+            with timer.stage("cacheLookup"):
+                cached: dict[str, Any] | None = profile_cache.get(key)
+            if cached is not None:
+                timer.count("cacheHits")
+                for column, profile in zip(task.fields, cached["profiles"], strict=True):
+                    column.update(profile)
+                errors = [
+                    error | {"dataset": str(task.dataset), "file": str(task.path)}
+                    for error in cached["errors"]
+                ]
+                return FileResult(task.dataset, task.record, task.fields, errors, cached=True)
+
+        try:
+            with timer.stage("detect"):
+                encoding, separator = self.analyze_csv_file(task.path, len(task.fields))
+            with timer.stage("readCsv"):
                 table = pd.read_csv(
-                    csv_file,
+                    task.path,
                     encoding=encoding,
                     sep=separator,
                     engine="python",
                     on_bad_lines="skip",
                 )
-                assert len(table.columns) >= len(file_record["field"]), (
-                    f"Number of columns and fields do not match: {csv_file}"
-                )
+            timer.count("bytesRead", task.size)
+            timer.count("rowsParsed", len(table))
+            assert len(table.columns) >= len(task.fields), (
+                f"Number of columns and fields do not match: {task.path}"
+            )
+        except Exception as e:  # noqa: BLE001
+            self.handle_exception(task.dataset, e, 0, file=task.path)
+            return FileResult(task.dataset, task.record, task.fields, drain_errors())
+        original = [dict(column) for column in task.fields]
+        with timer.stage("profile"):
+            columns = self.profile_columns(task, table)
+        errors = drain_errors()
+
+        # convert only what profiling added to JSON types; the rest already came from JSON
+        with timer.stage("serialize"):
+            profiles = [
+                to_json({k: v for k, v in column.items() if k not in before or before[k] is not v})
+                for before, column in zip(original, task.fields, strict=True)
+            ]
+            for column, profile in zip(task.fields, profiles, strict=True):
+                column.update(profile)
+        if key is not None and profile_cache is not None:
+            # only cache what profiling added, so that duplicates with other names can reuse it
+            with timer.stage("cacheStore"):
+                profile_cache.put(key, {"profiles": profiles, "errors": errors})
+        return FileResult(task.dataset, task.record, task.fields, errors, columns=columns)
+
+    def profile_columns(self, task: FileTask, table: pd.DataFrame) -> list[tuple[str, str, float]]:
+        """Profile the columns of a table and return the time spent on each column."""
+        # remove unnecessary spaces
+        table.columns = table.columns.str.strip()
+        timings = []
+        # iterate through each column
+        for j, column in enumerate(task.fields):
+            start = time.perf_counter()
+            data_type = "unknown"
+            try:
+                data_type = column["dataType"][0].rsplit(":", 1)[-1].lower()
+                data = table.iloc[:, j].dropna()
+                if data_type in {"int", "integer", "float"}:
+                    self.process_numerical(data, column)
+                elif data_type == "text":
+                    self.process_text(data, column)
+                elif data_type == "boolean":
+                    self.process_bool(data, column)
+                elif data_type == "date":
+                    self.process_date(data, column)
             except Exception as e:  # noqa: BLE001
-                self.handle_exception(path, e, 0)
-                continue
-            # remove unnecessary spaces
-            table.columns = table.columns.str.strip()
-            # iterate through each column
-            for j, column in enumerate(file_record["field"]):
-                try:
-                    data_type = column["dataType"][0].rsplit(":", 1)[-1].lower()
-                    data = table.iloc[:, j].dropna()
-                    if data_type in {"int", "integer", "float"}:
-                        self.process_numerical(data, column)
-                    elif data_type == "text":
-                        self.process_text(data, column)
-                    elif data_type == "boolean":
-                        self.process_bool(data, column)
-                    elif data_type == "date":
-                        self.process_date(data, column)
-                except Exception as e:  # noqa: BLE001
-                    self.handle_exception(path, e, 1)
-                    column["error"] = str(e)
-                    continue
+                self.handle_exception(
+                    task.dataset, e, 1, file=task.path, column=column.get("name")
+                )
+                column["error"] = str(e)
+            finally:
+                timings.append((str(column.get("name")), data_type, time.perf_counter() - start))
+        return timings
 
-        # write metadata to target_dir
+    def write_profile(self, path: Path, metadata: dict[str, Any]) -> None:
+        """Write the enriched metadata of a dataset to `target_dir`."""
+        if self.output_format == "parquet":
+            return
+        # name the dataset like the column profile table does, also if the metadata lacks a ref
+        metadata.setdefault("kaggleRef", ref_of(path))
         file_name = "/".join(str(path).split("/")[-2:]).replace("/", "_") + ".json"
-        metadata = self.sanitize_json(metadata)
         try:
-            with (self.target_dir / file_name).open("w") as file:
-                json.dump(metadata, file, indent=4, ensure_ascii=False, allow_nan=False)
+            dump_json(metadata, self.target_dir / file_name, indent=self.indent)
         except Exception as e:  # noqa: BLE001
             self.handle_exception(path, e, 0)
-            print("NaN error detected with metadata: ", metadata_path)
-            return
+            print("NaN error detected with metadata: ", path / "croissant_metadata.json")
+
+    def process_dataset(self, path: Path) -> list[dict[str, Any]]:
+        """Enrich a single dataset in the current process and return its errors."""
+        loaded = self.load_dataset(path)
+        if loaded is None:
+            return drain_errors()
+        metadata, tasks = loaded
+        errors = []
+        for task in tasks:
+            result = self.process_file(task)
+            metadata["recordSet"][result.record]["field"] = result.fields
+            errors.extend(result.errors)
+        self.write_profile(path, metadata)
+        return errors + drain_errors()
+
+    def profile(self, path: Path, output: Path) -> None:
+        """Enrich a single dataset under cProfile and save the statistics to `output`."""
+        profiler = cProfile.Profile()
+        profiler.runcall(self.process_dataset, path)
+        profiler.dump_stats(output)
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+        print(f"Saved profile of {path} to {output}")
 
-    def merge_errors(self) -> None:
-        lines: list[str] = []
-        for error_file in self.error_dir.iterdir():
-            if error_file.is_file():
-                with error_file.open("r", encoding="utf-8") as f:
-                    lines.extend(f.readlines())
-        lines = [line.replace("\n", "") for line in lines]
-        lines.sort()
-        output_file = Path("../error_list.log")
-        output_file.write_text("\n".join(lines), encoding="utf-8")
-
-    def calculate_kaggle_path(self, path: Path, base_dir: Path) -> str:
-        path = path.relative_to(base_dir.parent)
-        filename = path.name
-        same_names: list[Path] = []
-        for p in base_dir.rglob(filename):
-            p_relative = p.relative_to(base_dir.parent)
-            if p_relative != path:
-                same_names.append(p_relative)
-        # no conflicts with other paths, return just the filename
-        if len(same_names) == 0:
-            return filename
-        # search for earliest folder where paths diverge
-        i = 0
-        while all(p.parts[i] == path.parts[i] for p in same_names):
-            i += 1
-        return str(Path(*path.parts[i:])).replace("/", "_")
-
-    def start(self) -> None:
+    def estimate_memory(self, task: FileTask) -> int:
+        return task.size * CSV_MEMORY_FACTOR
+
+    def start(
+        self, pool: SupervisedPool[FileTask, FileResult] | None = None, batch: int | None = None
+    ) -> dict[str, Any]:
         dataset_paths = [
             path.parent
             for path in self.source_dir.rglob("croissant_metadata.json")
-            if len(list(path.parent.iterdir())) > 1
+            if self.shard is None or self.shard.owns(ref_of(path.parent))
         ]
-        dataset_paths = dataset_paths[: min(self.max_count, len(dataset_paths))]
-        n_datasets = len(dataset_paths)
+        # the files of each dataset are listed once, for sorting and for resolving its records
+        listings: dict[Path, tuple[list[str], list[int]]] = {}
+        for path in dataset_paths:
+            if len(listings) >= self.max_count:
+                break
+            if (files := list_files(path))[0]:
+                listings[path] = files
+        # largest datasets first, so that the last tasks in the pool are small files
+        dataset_paths = sorted(listings, key=lambda path: sum(listings[path][1]), reverse=True)
+        return self.enrich(
+            dataset_paths, total=len(dataset_paths), pool=pool, batch=batch, listings=listings
+        )
 
-        error_count = mp.Value("I", 0)
-        with mp.Pool(
-            processes=self.num_processes, initializer=init_workers, initargs=(error_count,)
-        ) as pool:
-            list(tqdm(pool.imap_unordered(self.process_dataset, dataset_paths), total=n_datasets))
+    def pool(self) -> SupervisedPool[FileTask, FileResult]:
+        """Start a worker pool that keeps the configuration of this creator.
 
-        self.merge_errors()
-        print(f"{error_count.value} errors occurred while processing {n_datasets} datasets")
+        The creator is sent to each worker once by the initializer, so tasks only carry files.
+        """
+        return SupervisedPool(
+            process_file,
+            processes=self.num_processes,
+            initializer=init_workers,
+            initargs=(self,),
+            task_timeout=self.task_timeout,
+            max_rss=self.max_rss,
+            max_tasks_per_child=self.max_tasks_per_child,
+            memory_estimate=self.estimate_memory,
+            memory_budget=int(self.memory_fraction * available_memory()),
+        )
 
+    def column_table_path(self, batch: int | None = None) -> Path:
+        """Return the path of the column profile table of a run or of its part of a batch.
 
-def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="create histograms for kaggle datasets")
-    parser.add_argument(
-        "--source",
-        type=str,
-        default=(BASE_DIR / "../kaggle_metadata"),
-        help="path to metadata (default %(default)s)",
-    )
+        The batches of a server write one part each into the `column_profiles.parquet` directory.
+        """
+        path = self.target_dir / "column_profiles.parquet"
+        return path if batch is None else path / f"batch-{batch:05d}.parquet"
+
+    def clear_outputs(self) -> None:
+        """Clear the error log and the column profile table, which batches of a server extend."""
+        self.error_log.parent.mkdir(parents=True, exist_ok=True)
+        self.error_log.write_text("", encoding="utf-8")
+        path = self.column_table_path()
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink(missing_ok=True)
+
+    def enrich(
+        self,
+        dataset_paths: Iterable[Path],
+        total: int | None = None,
+        pool: SupervisedPool[FileTask, FileResult] | None = None,
+        batch: int | None = None,
+        listings: dict[Path, tuple[list[str], list[int]]] | None = None,
+    ) -> dict[str, Any]:
+        """Enrich datasets in the order of `dataset_paths` and return a summary of the run.
+
+        The paths are consumed lazily by the feeder thread of the pool, so they may come from a
+        generator that blocks until the next dataset is available. A given `pool` is reused and
+        stays open, otherwise a new pool is started and closed at the end. Numbered batches of a
+        server append to the error log and write column profiles to a part of their own.
+        Datasets without `listings` of their files are scanned when they are loaded.
+        """
+        start = time.perf_counter()
+        error_log = ErrorLog(self.error_log, append=batch is not None)
+        report = TimingReport(self.top_n)
+        if self.cache is not None:
+            self.cache.evict()
+            # workers started by fork must not inherit the connection of the parent
+            self.cache.close()
+        with (
+            contextlib.nullcontext(pool) if pool is not None else self.pool() as workers,
+            tqdm(total=total) as progress,
+        ):
+            column_table = None
+            if self.output_format in {"parquet", "both"}:
+                table_path = self.column_table_path(batch)
+                table_path.parent.mkdir(parents=True, exist_ok=True)
+                column_table = ColumnTableWriter(table_path, atomic=batch is not None)
+            assembler = ProfileAssembler(
+                self,
+                progress,
+                error_log,
+                column_table,
+                report,
+                max_open=4 * self.num_processes,
+                listings=listings,
+            )
+            tasks = assembler.schedule(dataset_paths)
+            for outcome in workers.imap_unordered(tasks):
+                task, result = outcome.task, outcome.result
+                if result is None:
+                    # the worker was killed or the task failed outside of process_file
+                    error = outcome.error or MissingResultError("Task returned no result")
+                    self.handle_exception(task.dataset, error, 0, file=task.path)
+                    result = FileResult(task.dataset, task.record, task.fields, drain_errors())
+                else:
+                    error_log.complete(strike_key(task.dataset, task.path))
+                assembler.complete(result)
+            if column_table is not None:
+                column_table.close()
+        report.timer.merge(assembler.feeder_timer.seconds, assembler.feeder_timer.counters)
+        n_datasets = progress.n
+
+        error_log.add(drain_errors())
+        error_log.flush()
+        print(f"{error_log.count} errors occurred while processing {n_datasets} datasets")
+        unresolved = error_log.types[UnresolvedFileError.__name__]
+        ambiguous = error_log.types[AmbiguousFileError.__name__]
+        if unresolved or ambiguous:
+            print(f"{unresolved} record files could not be resolved, {ambiguous} were ambiguous")
+        print(report.summary())
+        if self.report_path is not None:
+            report.write(self.report_path, time.perf_counter() - start)
+            print(f"Saved timing report to {self.report_path}")
+        if self.cache is not None:
+            n_files = assembler.cache_hits + assembler.cache_misses
+            hit_rate = assembler.cache_hits / n_files if n_files else 0
+            evicted = self.cache.evict()
+            self.cache.close()
+            print(
+                f"Profile cache: {assembler.cache_hits} hits, {assembler.cache_misses} misses "
+                f"({hit_rate:.2%} hit rate), {evicted} entries evicted"
+            )
+        return {
+            "datasets": n_datasets,
+            "errors": error_log.count,
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+
+
+def serve(creator: HistogramCreator, socket_path: Path) -> None:
+    """Enrich batches of datasets sent over a Unix socket with one long-lived worker pool.
+
+    Each request is a dict with the `source` directory of a batch, which is enriched like a run of
+    this script, or `{"command": "stop"}`. The reply is the summary of the batch. Batches are
+    enriched one after another by the same warm workers, so a batch starts without any process
+    startup. All batches of a server share one error log and one column profile table, which are
+    cleared when the server starts. A dataset sent again replaces its rows of earlier batches in
+    the table. Failed or malformed requests are answered with an `error` and the server keeps
+    running. The socket is only accessible to the current user, since requests are pickled.
+    """
+    socket_path.unlink(missing_ok=True)
+    umask = os.umask(0o077)
+    try:
+        listener = Listener(str(socket_path), family="AF_UNIX")
+    finally:
+        os.umask(umask)
+    creator.clear_outputs()
+    batch = 0
+    # the part of the column profile table that holds the rows of each dataset
+    owners: dict[str, Path] = {}
+    with creator.pool() as pool, listener:
+        print(f"Serving enrichment batches on {socket_path} with {creator.num_processes} workers")
+        stop = False
+        while not stop:
+            try:
+                connection = listener.accept()
+            except OSError as e:
+                print(f"Failed to accept a connection: {e}", flush=True)
+                continue
+            with connection:
+                reply: dict[str, Any]
+                try:
+                    request: dict[str, Any] = connection.recv()
+                    stop = request.get("command") == "stop"
+                    if stop:
+                        reply = {"stopped": True}
+                    else:
+                        # every attempt gets a new number, so parts never overwrite each other
+                        batch += 1
+                        reply = enrich_batch(creator, pool, Path(request["source"]), batch, owners)
+                except Exception as e:  # noqa: BLE001
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                try:
+                    connection.send(reply)
+                except OSError as e:
+                    print(f"Failed to reply to a request: {e}", flush=True)
+    socket_path.unlink(missing_ok=True)
+
+
+def enrich_batch(
+    creator: HistogramCreator,
+    pool: SupervisedPool[FileTask, FileResult],
+    source_dir: Path,
+    batch: int,
+    owners: dict[str, Path],
+) -> dict[str, Any]:
+    """Enrich a batch of a server and replace the rows of its datasets from earlier batches."""
+    creator.source_dir = source_dir
+    summary = creator.start(pool, batch)
+    part = creator.column_table_path(batch)
+    if part.exists() and (superseded := supersede_rows(part, owners)):
+        print(f"Replaced the rows of {superseded} datasets from earlier batches")
+    return summary
+
+
+class ProfileAssembler:
+    """Feed per-file tasks to the pool and assemble dataset profiles as their files complete.
+
+    Datasets are expanded in the given order and their files are scheduled largest-first. At most
+    `max_open` datasets are in flight at once, which bounds the metadata held by the parent while
+    the pool works through the files.
+    """
+
+    def __init__(
+        self,
+        creator: HistogramCreator,
+        progress: tqdm,
+        error_log: ErrorLog,
+        column_table: ColumnTableWriter | None,
+        report: TimingReport,
+        max_open: int,
+        listings: dict[Path, tuple[list[str], list[int]]] | None = None,
+    ) -> None:
+        self.creator = creator
+        # file listings of the datasets, released once a dataset is loaded
+        self.listings = {} if listings is None else listings
+        self.progress = progress
+        self.error_log = error_log
+        self.column_table = column_table
+        self.report = report
+        # the feeder thread gets its own timer, since timers are not thread-safe
+        self.feeder_timer = StageTimer()
+        self.open_slots = threading.BoundedSemaphore(max_open)
+        self.lock = threading.Lock()
+        # strikes of earlier runs, since this run's kills are only counted once it is flushed
+        self.strikes = error_log.strikes.copy()
+        # metadata, remaining files and summed file seconds of each open dataset
+        self.pending: dict[Path, tuple[dict[str, Any], int, float]] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def schedule(self, dataset_paths: Iterable[Path]) -> Iterator[FileTask]:
+        """Yield file tasks; runs in the feeder thread of the pool."""
+        for path in dataset_paths:
+            try:
+                with self.feeder_timer.stage("loadMetadata"):
+                    loaded = self.creator.load_dataset(path, self.listings.pop(path, None))
+            except Exception as e:  # noqa: BLE001
+                self.creator.handle_exception(path, e, 2)
+                loaded = None
+            if loaded is None:
+                self.error_log.add(drain_errors())
+                self.progress.update(1)
+                continue
+            metadata, tasks = loaded
+            tasks = [task for task in tasks if not self.quarantined(task)]
+            self.error_log.add(drain_errors())
+            if not tasks:
+                self.write(path, metadata, self.feeder_timer)
+                self.progress.update(1)
+                continue
+            self.open_slots.acquire()
+            with self.lock:
+                self.pending[path] = (metadata, len(tasks), 0.0)
+            yield from sorted(tasks, key=operator.attrgetter("size"), reverse=True)
+
+    def quarantined(self, task: FileTask) -> bool:
+        """Skip files whose tasks were killed in `max_strikes` earlier runs."""
+        strikes = self.strikes[strike_key(task.dataset, task.path)]
+        if strikes < self.creator.max_strikes:
+            return False
+        error = QuarantinedFileError(f"Skipped after {strikes} killed attempts")
+        self.creator.handle_exception(task.dataset, error, 0, file=task.path)
+        return True
+
+    def complete(self, result: FileResult) -> None:
+        """Store the profiled fields of a file and write the dataset once all files are done."""
+        if result.cached:
+            self.cache_hits += 1
+        else:
+            self.cache_misses += 1
+        self.error_log.add(result.errors)
+        ref = ref_of(result.dataset)
+        seconds = result.timer.seconds.get("total", 0.0)
+        with self.lock:
+            metadata, remaining, total = self.pending[result.dataset]
+            file_id = metadata["recordSet"][result.record].get("@id", str(result.record))
+            self.report.add_file(
+                ref, file_id, result.timer.seconds, result.timer.counters, result.columns
+            )
+            metadata["recordSet"][result.record]["field"] = result.fields
+            remaining -= 1
+            total += seconds
+            if remaining > 0:
+                self.pending[result.dataset] = (metadata, remaining, total)
+                return
+            del self.pending[result.dataset]
+        self.report.add_dataset(ref, total, len(metadata["recordSet"]))
+        self.write(result.dataset, metadata, self.report.timer)
+        self.open_slots.release()
+        self.progress.update(1)
+
+    def write(self, path: Path, metadata: dict[str, Any], timer: StageTimer) -> None:
+        with timer.stage("writeJson"):
+            self.creator.write_profile(path, metadata)
+        if self.column_table is not None:
+            with self.lock, timer.stage("writeParquet"):
+                self.column_table.add(ref_of(path), metadata)
+        self.error_log.add(drain_errors())
+
+
+def add_enrichment_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the arguments that configure a `HistogramCreator`, except for its source."""
     parser.add_argument(
         "--result",
         type=str,
@@ -329,10 +926,10 @@ def parse_args() -> argparse.Namespace:
         help="path to result dir (default %(default)s)",
     )
     parser.add_argument(
-        "--error-dir",
+        "--error-log",
         type=str,
-        default=(BASE_DIR / "../errors"),
-        help="path to error dir (default %(default)s)",
+        default=(BASE_DIR / "../error_list.jsonl"),
+        help="path to the error table (default %(default)s)",
     )
     parser.add_argument(
         "--max-datasets",
@@ -353,31 +950,174 @@ def parse_args() -> argparse.Namespace:
         default=mp.cpu_count(),
         help="number of workers to use (default %(default)s)",
     )
+    parser.add_argument(
+        "--approx-threshold",
+        type=int,
+        default=None,
+        help="estimate distinct and most common values of text columns with more distinct "
+        "values than this threshold (default: exact counts)",
+    )
+    parser.add_argument(
+        "--minhash",
+        type=int,
+        default=None,
+        help="add a MinHash signature of this many permutations to numeric and text columns "
+        "for join discovery, e.g. 128 (default: no signatures)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "parquet", "both"],
+        default="json",
+        help="write enriched croissant files, a column profile table, or both "
+        "(default %(default)s)",
+    )
+    parser.add_argument(
+        "--indent",
+        type=int,
+        default=None,
+        help="indentation of the enriched croissant files (default: compact)",
+    )
+    parser.add_argument(
+        "--task-timeout",
+        type=float,
+        default=None,
+        help="kill and replace a worker after this many seconds on one file (default: no limit)",
+    )
+    parser.add_argument(
+        "--max-rss",
+        type=int,
+        default=None,
+        help="kill and replace a worker above this resident memory in MB (default: no limit)",
+    )
+    parser.add_argument(
+        "--max-tasks-per-child",
+        type=int,
+        default=None,
+        help="replace workers after this many files (default: never)",
+    )
+    parser.add_argument(
+        "--memory-fraction",
+        type=float,
+        default=0.8,
+        help="fraction of the available memory that concurrently profiled files may use "
+        "(default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-strikes",
+        type=int,
+        default=2,
+        help="skip files that were killed in this many runs (default %(default)s)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="path to write a JSON report with stage timings and the slowest datasets, files "
+        "and columns (default: no report)",
+    )
+    parser.add_argument(
+        "--top-n",
+        type=int,
+        default=20,
+        help="number of slowest datasets, files and columns in the report (default %(default)s)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="path to a persistent profile cache database (default: no cache)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=10240,
+        help="max size of the profile cache in MB (default %(default)s)",
+    )
+    parser.add_argument(
+        "--start-method",
+        choices=mp.get_all_start_methods(),
+        default="forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn",
+        help="how worker processes are started; forkserver imports pandas, numpy and cchardet "
+        "once and forks workers from there (default %(default)s)",
+    )
+    add_shard_argument(parser)
+
+
+def create_creator(args: argparse.Namespace, source_dir: Path) -> HistogramCreator:
+    """Create a `HistogramCreator` from the arguments of `add_enrichment_arguments`."""
+    result_dir = Path(args.result)
+    result_dir.mkdir(exist_ok=True, parents=True)
+    cache = None
+    if args.cache is not None:
+        cache = ProfileCache(Path(args.cache), max_bytes=args.cache_size * 1024**2)
+
+    return HistogramCreator(
+        source_dir=source_dir,
+        target_dir=result_dir,
+        error_log=Path(args.error_log),
+        max_count=args.max_datasets,
+        bin_count=args.bin_count,
+        workers=args.workers,
+        approx_threshold=args.approx_threshold,
+        cache=cache,
+        output_format=args.format,
+        indent=args.indent,
+        task_timeout=args.task_timeout,
+        max_rss=None if args.max_rss is None else args.max_rss * 1024**2,
+        max_tasks_per_child=args.max_tasks_per_child,
+        memory_fraction=args.memory_fraction,
+        max_strikes=args.max_strikes,
+        report_path=None if args.profile is None else Path(args.profile),
+        top_n=args.top_n,
+        shard=args.shard,
+        minhash_size=args.minhash,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="create histograms for kaggle datasets")
+    parser.add_argument(
+        "--source",
+        type=str,
+        default=(BASE_DIR / "../kaggle_metadata"),
+        help="path to metadata (default %(default)s)",
+    )
+    parser.add_argument(
+        "--profile-dataset",
+        type=str,
+        default=None,
+        help="enrich only this dataset (<user>/<dataset>) under cProfile (default: disabled)",
+    )
+    parser.add_argument(
+        "--serve",
+        type=str,
+        default=None,
+        help="keep the workers running and enrich batches sent by enrich_client.py over this "
+        "Unix socket until stopped (default: enrich --source once)",
+    )
+    add_enrichment_arguments(parser)
     return parser.parse_args()
 
 
 def main() -> None:
     start = time.perf_counter()
-    mp.set_start_method("spawn")
     args = parse_args()
-    result_dir = Path(args.result)
+    set_start_method(args.start_method)
     source_dir = Path(args.source)
-    error_dir = Path(args.error_dir)
 
+    if args.serve is not None:
+        serve(create_creator(args, source_dir), Path(args.serve))
+        return
     if not source_dir.exists():
         print("This program requires a directory with croissant metadata to work!")
         sys.exit(1)
-    result_dir.mkdir(exist_ok=True)
 
-    creator = HistogramCreator(
-        source_dir=source_dir,
-        target_dir=result_dir,
-        error_dir=error_dir,
-        max_count=args.max_datasets,
-        bin_count=args.bin_count,
-        workers=args.workers,
-    )
-    creator.start()
+    creator = create_creator(args, source_dir)
+    if args.profile_dataset is not None:
+        output = creator.target_dir / (args.profile_dataset.replace("/", "_") + ".prof")
+        creator.profile(source_dir / args.profile_dataset, output)
+    else:
+        creator.start()
     print(f"Finished in {time.perf_counter() - start:.2f} seconds.")
 
 
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import os
+from collections import defaultdict
+from pathlib import Path, PurePosixPath
+from urllib.parse import unquote
+
+IGNORED_FILES = {"croissant_metadata.json"}
+
+
+class UnresolvedFileError(FileNotFoundError):
+    pass
+
+
+class AmbiguousFileError(LookupError):
+    pass
+
+
+def normalize(name: str) -> list[str]:
+    """Return the spellings under which a `contentUrl` or `@id` may refer to a file."""
+    variants = []
+    for variant in (name, unquote(name), unquote(name.replace("+", " "))):
+        variant = variant.strip()  # noqa: PLW2901
+        while variant.startswith(("./", "/")):
+            variant = variant.removeprefix(".").removeprefix("/")  # noqa: PLW2901
+        variants.append(variant)
+    return list(dict.fromkeys(variants))
+
+
+def list_files(root: Path) -> tuple[list[str], list[int]]:
+    """Return the relative paths and sizes of the files of a dataset with one directory scan."""
+    names: list[str] = []
+    sizes: list[int] = []
+    for directory, _, files in os.walk(root):
+        for file in files:
+            if file in IGNORED_FILES:
+                continue
+            full_path = Path(directory) / file
+            names.append(full_path.relative_to(root).as_posix())
+            sizes.append(full_path.stat().st_size)
+    return names, sizes
+
+
+class FileIndex:
+    """Index of the files of one dataset for resolving `recordSet` entries in O(1).
+
+    Every file is registered under all suffixes of its relative path, both with `/` and with `_`
+    as separator, since Kaggle flattens nested paths into `@id`s like `dir_file.csv` and only
+    keeps as many parent directories as necessary to make names unique. A name that is the exact
+    relative path of a file always resolves to that file, even if it is also a suffix of others.
+    """
+
+    def __init__(self, root: Path, names: list[str], sizes: list[int] | None = None) -> None:
+        self.root = root
+        # exact relative paths, which take precedence over suffixes
+        self.sizes: dict[PurePosixPath, int] = {}
+        self.keys: defaultdict[str, set[PurePosixPath]] = defaultdict(set)
+        for i, name in enumerate(names):
+            relative = PurePosixPath(name)
+            self.sizes[relative] = 0 if sizes is None else sizes[i]
+            parts = relative.parts
+            for start in range(len(parts)):
+                self.keys["/".join(parts[start:])].add(relative)
+                self.keys["_".join(parts[start:])].add(relative)
+
+    @classmethod
+    def scan(cls, root: Path) -> FileIndex:
+        """Build the index with a single directory scan."""
+        return cls(root, *list_files(root))
+
+    def size(self, path: Path) -> int:
+        return self.sizes.get(PurePosixPath(path.relative_to(self.root).as_posix()), 0)
+
+    def resolve(self, *names: str) -> Path:
+        """Resolve the first name that matches exactly one file of the dataset.
+
+        Raises:
+            AmbiguousFileError: If a name matches several files and no other name is unique.
+            UnresolvedFileError: If none of the names match a file.
+        """
+        ambiguous: set[PurePosixPath] = set()
+        for name in names:
+            variants = normalize(name)
+            for variant in variants:
+                if (exact := PurePosixPath(variant)) in self.sizes:
+                    return self.root / exact
+            for variant in variants:
+                matches = self.keys.get(variant, set())
+                if len(matches) == 1:
+                    return self.root / next(iter(matches))
+                ambiguous |= matches
+        if ambiguous:
+            candidates = ", ".join(sorted(str(match) for match in ambiguous))
+            raise AmbiguousFileError(f"{names[0]} matches several files: {candidates}")
+        raise UnresolvedFileError(f"No file matches {' or '.join(dict.fromkeys(names))}")
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from dataset_scrapers.kaggle.download_datasets import DatasetDownloader
+from dataset_scrapers.kaggle.download_metadata import MetadataDownloader
+from dataset_scrapers.kaggle.local_server import (
+    Faults,
+    LocalKaggleServer,
+    add_fault_arguments,
+    corpus_refs,
+    faults_from_args,
+)
+
+
+class LoadTester:
+    """Run both crawlers against a local Kaggle stand-in and measure throughput and recovery."""
+
+    def __init__(
+        self,
+        corpus_dir: Path,
+        output_dir: Path,
+        workers: int = 8,
+        max_retries: int = 3,
+        max_datasets: int | None = None,
+        faults: Faults | None = None,
+        seed: int | None = None,
+        base_url: str | None = None,
+    ) -> None:
+        self.corpus_dir = corpus_dir
+        self.output_dir = output_dir
+        self.workers = workers
+        self.max_retries = max_retries
+        self.max_datasets = max_datasets
+        self.faults = faults or Faults()
+        self.seed = seed
+        self.base_url = base_url
+
+    def run(self) -> dict[str, Any]:
+        server = None
+        base_url = self.base_url
+        if base_url is None:
+            server = LocalKaggleServer(self.corpus_dir, faults=self.faults, seed=self.seed)
+            server.start()
+            base_url = server.url
+        try:
+            report = self.crawl(base_url)
+        finally:
+            if server is not None:
+                server.stop()
+        if server is not None:
+            report["server"] = {
+                "responses": dict(server.responses),
+                "bytesSent": server.bytes_sent,
+            }
+        return report
+
+    def crawl(self, base_url: str) -> dict[str, Any]:
+        refs = corpus_refs(self.corpus_dir)[: self.max_datasets]
+        metadata_dir = self.output_dir / "metadata"
+        data_dir = self.output_dir / "data"
+        metadata_dir.mkdir(parents=True, exist_ok=True)
+        data_dir.mkdir(parents=True, exist_ok=True)
+
+        metadata_downloader = MetadataDownloader(
+            data_dir,
+            metadata_dir,
+            num_workers=self.workers,
+            base_url=base_url,
+            max_retries=self.max_retries,
+            request_delay=0,
+        )
+        start = time.perf_counter()
+        metadata_downloader.collect_metadata(0, refs)
+        metadata_seconds = time.perf_counter() - start
+
+        dataset_downloader = DatasetDownloader(
+            metadata_dir, base_url=base_url, max_retries=self.max_retries
+        )
+        existing_bytes = self.downloaded_bytes()
+        start = time.perf_counter()
+        dataset_downloader.start()
+        dataset_seconds = time.perf_counter() - start
+        n_bytes = self.downloaded_bytes() - existing_bytes
+
+        return {
+            "metadata": {
+                "refs": len(refs),
+                "downloaded": metadata_downloader.metadata_count,
+                "errors": metadata_downloader.error_count,
+                "rateLimited": metadata_downloader.rate_limited,
+                "seconds": metadata_seconds,
+                "refsPerSecond": len(refs) / metadata_seconds,
+                "retries": dict(metadata_downloader.session.retries),
+                "waited": metadata_downloader.session.waited,
+            },
+            "datasets": {
+                "downloaded": dataset_downloader.downloaded,
+                "failed": dataset_downloader.failed,
+                "skipped": dataset_downloader.skipped,
+                "seconds": dataset_seconds,
+                "datasetsPerSecond": dataset_downloader.downloaded / dataset_seconds,
+                "bytes": n_bytes,
+                "mbPerSecond": n_bytes / 1024**2 / dataset_seconds,
+                "retries": dict(dataset_downloader.session.retries),
+                "waited": dataset_downloader.session.waited,
+            },
+        }
+
+    def downloaded_bytes(self) -> int:
+        return sum(
+            path.stat().st_size
+            for path in (self.output_dir / "metadata").rglob("*")
+            if path.is_file() and path.name != "croissant_metadata.json"
+        )
+
+
+def print_report(report: dict[str, Any]) -> None:
+    metadata, datasets = report["metadata"], report["datasets"]
+    print(
+        f"Metadata: {metadata['downloaded']}/{metadata['refs']} downloaded, "
+        f"{metadata['errors']} errors in {metadata['seconds']:.2f}s "
+        f"({metadata['refsPerSecond']:.1f} refs/s)"
+        + (", stopped by rate limits" if metadata["rateLimited"] else "")
+    )
+    print(f"  retries: {metadata['retries']}, waited {metadata['waited']:.1f}s")
+    print(
+        f"Datasets: {datasets['downloaded']} downloaded, {datasets['failed']} failed, "
+        f"{datasets['skipped']} skipped in {datasets['seconds']:.2f}s "
+        f"({datasets['datasetsPerSecond']:.1f} datasets/s, {datasets['mbPerSecond']:.1f} MB/s)"
+    )
+    print(f"  retries: {datasets['retries']}, waited {datasets['waited']:.1f}s")
+    if "server" in report:
+        print(f"Server responses: {report['server']['responses']}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="load-test the kaggle crawlers offline")
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default="../synthetic_corpus",
+        help="path to the corpus to serve (default %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="../load_test",
+        help="path for the crawled metadata and datasets (default %(default)s)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="keep the output of an earlier run and skip what was already crawled",
+    )
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default=None,
+        help="crawl a server that is already running instead of starting one (default: none)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=8,
+        help="number of parallel workers used to download metadata (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="retries per request of the crawlers (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-datasets",
+        type=int,
+        default=None,
+        help="max count of datasets to crawl (default: all)",
+    )
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help="path to write the report as JSON (default: none)",
+    )
+    add_fault_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    corpus_dir = Path(args.corpus)
+    output_dir = Path(args.output)
+    if not corpus_dir.exists():
+        print("This program requires a directory with croissant metadata to work!")
+        sys.exit(1)
+    if not args.resume:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    tester = LoadTester(
+        corpus_dir,
+        output_dir,
+        workers=args.workers,
+        max_retries=args.max_retries,
+        max_datasets=args.max_datasets,
+        faults=faults_from_args(args),
+        seed=args.seed,
+        base_url=args.base_url,
+    )
+    report = tester.run()
+    print_report(report)
+    if args.report is not None:
+        Path(args.report).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import zipfile
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+if TYPE_CHECKING:
+    from types import TracebackType
+
+CROISSANT_PATH = re.compile(r"^/datasets/([^/]+/[^/]+)/croissant/download$")
+ARCHIVE_PATH = re.compile(r"^/api/v1/datasets/download/([^/]+/[^/]+)$")
+
+
+def corpus_refs(corpus_dir: Path) -> list[str]:
+    """Return the refs of all datasets in a corpus, i.e. `<user>/<slug>` of each metadata file."""
+    return sorted(
+        "/".join(path.parent.relative_to(corpus_dir).parts)
+        for path in corpus_dir.rglob("croissant_metadata.json")
+    )
+
+
+@dataclass
+class Faults:
+    """Faults that the local server injects into its responses."""
+
+    latency: float = 0.0
+    rate_limit: float | None = None
+    error_rate: float = 0.0
+    truncate_rate: float = 0.0
+
+
+class TokenBucket:
+    """Allow `rate` requests per second with bursts of up to `rate` requests."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token and return 0, or return the seconds until the next token is available."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: _Server
+
+    def do_GET(self) -> None:  # noqa: N802
+        self.server.stand_in.handle(self)
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], stand_in: LocalKaggleServer) -> None:
+        super().__init__(address, _Handler)
+        self.stand_in = stand_in
+
+
+class LocalKaggleServer:
+    """Local stand-in for the Kaggle endpoints used by the crawlers.
+
+    Serves the Croissant metadata (`/datasets/<ref>/croissant/download`) and zipped dataset files
+    (`/api/v1/datasets/download/<ref>`) of a corpus in the layout of `download_datasets.py`, e.g.
+    one generated by `benchmark/generate_corpus.py`. Latency, rate limiting with `Retry-After`,
+    server errors, and truncated responses can be injected to load-test the crawlers offline.
+    """
+
+    def __init__(
+        self,
+        corpus_dir: Path,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        faults: Faults | None = None,
+        seed: int | None = None,
+        max_cached_archives: int = 64,
+    ) -> None:
+        self.corpus_dir = corpus_dir
+        self.faults = faults or Faults()
+        self.bucket = (
+            None if self.faults.rate_limit is None else TokenBucket(self.faults.rate_limit)
+        )
+        self.random = random.Random(seed)  # noqa: S311
+        self.lock = threading.Lock()
+        self.responses: Counter[str] = Counter()
+        self.bytes_sent = 0
+        self.archives: OrderedDict[str, bytes] = OrderedDict()
+        self.max_cached_archives = max_cached_archives
+        self.server = _Server((host, port), self)
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host!s}:{port}"
+
+    def __enter__(self) -> Self:
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Serve requests in a background thread."""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def chance(self, probability: float) -> bool:
+        with self.lock:
+            return self.random.random() < probability
+
+    def croissant(self, ref: str) -> bytes | None:
+        path = self.corpus_dir / ref / "croissant_metadata.json"
+        if not path.is_file():
+            return None
+        metadata = json.loads(path.read_text(encoding="utf-8"))
+        # Kaggle does not know the ref that the metadata downloader adds
+        metadata.pop("kaggleRef", None)
+        return json.dumps(metadata).encode()
+
+    def archive(self, ref: str) -> bytes | None:
+        with self.lock:
+            if ref in self.archives:
+                self.archives.move_to_end(ref)
+                return self.archives[ref]
+        dataset_dir = self.corpus_dir / ref
+        if not (dataset_dir / "croissant_metadata.json").is_file():
+            return None
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for path in sorted(dataset_dir.rglob("*")):
+                if path.is_file() and path.name != "croissant_metadata.json":
+                    archive.write(path, path.relative_to(dataset_dir).as_posix())
+        data = buffer.getvalue()
+        with self.lock:
+            self.archives[ref] = data
+            if len(self.archives) > self.max_cached_archives:
+                self.archives.popitem(last=False)
+        return data
+
+    def handle(self, request: BaseHTTPRequestHandler) -> None:
+        faults = self.faults
+        if faults.latency > 0:
+            time.sleep(faults.latency)
+        if self.bucket is not None and (wait := self.bucket.acquire()) > 0:
+            self.send(request, "rateLimited", 429, b"", {"Retry-After": str(math.ceil(wait))})
+            return
+        if faults.error_rate > 0 and self.chance(faults.error_rate):
+            with self.lock:
+                status = self.random.choice([500, 502, 503])
+            self.send(request, "serverError", status, b"")
+            return
+
+        path = request.path.split("?", 1)[0]
+        body, content_type = None, "application/json"
+        if match := CROISSANT_PATH.match(path):
+            body = self.croissant(match.group(1))
+        elif match := ARCHIVE_PATH.match(path):
+            body, content_type = self.archive(match.group(1)), "application/zip"
+        if body is None:
+            self.send(request, "notFound", 404, b"")
+        elif faults.truncate_rate > 0 and self.chance(faults.truncate_rate):
+            self.send(
+                request, "truncated", 200, body, {"Content-Type": content_type}, truncate=True
+            )
+        else:
+            self.send(request, "ok", 200, body, {"Content-Type": content_type})
+
+    def send(
+        self,
+        request: BaseHTTPRequestHandler,
+        outcome: str,
+        status: int,
+        body: bytes,
+        headers: dict[str, str] | None = None,
+        truncate: bool = False,
+    ) -> None:
+        request.send_response(status)
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.send_header("Content-Length", str(len(body)))
+        request.end_headers()
+        if truncate:
+            # announce the full length, send half of the body and drop the connection
+            body = body[: len(body) // 2]
+            request.close_connection = True
+        try:
+            request.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            outcome = "aborted"
+        with self.lock:
+            self.responses[outcome] += 1
+            self.bytes_sent += len(body)
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="latency in seconds added to every response (default %(default)s)",
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="requests per second before responding with 429 and Retry-After (default: none)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="fraction of requests that fail with 500, 502 or 503 (default %(default)s)",
+    )
+    parser.add_argument(
+        "--truncate-rate",
+        type=float,
+        default=0.0,
+        help="fraction of responses that are cut off after half of the body (default %(default)s)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=None, help="random seed for the faults (default: random)"
+    )
+
+
+def faults_from_args(args: argparse.Namespace) -> Faults:
+    return Faults(
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        error_rate=args.error_rate,
+        truncate_rate=args.truncate_rate,
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="serve a corpus like the kaggle api")
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default="../synthetic_corpus",
+        help="path to the corpus to serve (default %(default)s)",
+    )
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="host to bind to (default %(default)s)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8000, help="port to bind to (default %(default)s)"
+    )
+    add_fault_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    corpus_dir = Path(args.corpus)
+    if not corpus_dir.exists():
+        print("This program requires a directory with croissant metadata to work!")
+        sys.exit(1)
+
+    server = LocalKaggleServer(
+        corpus_dir, args.host, args.port, faults=faults_from_args(args), seed=args.seed
+    )
+    print(f"Serving {len(corpus_refs(corpus_dir))} datasets at {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+        print(f"Responses: {dict(server.responses)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+import pyarrow.parquet as pq
+
+from dataset_scrapers.serialization import COLUMN_SCHEMA, table_files
+from dataset_scrapers.sharding import ref_of
+
+ERROR_FIELDS = ("dataset", "file", "column", "mode", "type", "message")
+
+
+def link_or_copy(source: str, target: str) -> None:
+    """Hard-link a file to avoid copying datasets, falling back to a copy across devices."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+class ShardMerger:
+    """Merge the outputs of nodes that processed disjoint shards (`--shard i/N`) of all refs.
+
+    Each ref belongs to exactly one shard, so the outputs are combined without resolving
+    duplicates. Refs found in more than one shard are reported as conflicts and taken from the
+    first shard, since they hint at shards that were run with different counts.
+    """
+
+    def __init__(self, output_dir: Path) -> None:
+        self.output_dir = output_dir
+        self.conflicts: list[str] = []
+
+    def merge_metadata(self, metadata_dirs: list[Path]) -> int:
+        """Merge metadata stores including downloaded datasets and return the dataset count."""
+        target_dir = self.output_dir / "kaggle_metadata"
+        count = 0
+        for metadata_dir in metadata_dirs:
+            for path in sorted(metadata_dir.rglob("croissant_metadata.json")):
+                ref = ref_of(path.parent)
+                target = target_dir / ref
+                if target.exists():
+                    self.conflicts.append(ref)
+                    continue
+                shutil.copytree(path.parent, target, copy_function=link_or_copy)
+                count += 1
+        return count
+
+    def merge_results(self, result_dirs: list[Path]) -> int:
+        """Merge enriched croissant files and column profile tables and return the file count."""
+        target_dir = self.output_dir / "croissant"
+        target_dir.mkdir(parents=True, exist_ok=True)
+        count = 0
+        tables = []
+        for result_dir in result_dirs:
+            for path in sorted(result_dir.glob("*.json")):
+                target = target_dir / path.name
+                if target.exists():
+                    self.conflicts.append(path.stem)
+                    continue
+                link_or_copy(str(path), str(target))
+                count += 1
+            if (table := result_dir / "column_profiles.parquet").exists():
+                tables.append(table)
+        if tables:
+            self.merge_tables(tables, target_dir / "column_profiles.parquet")
+        return count
+
+    def merge_tables(self, tables: list[Path], target: Path) -> None:
+        """Concatenate column profile tables batch by batch."""
+        with pq.ParquetWriter(target, COLUMN_SCHEMA, compression="zstd") as writer:
+            for path in (path for table in tables for path in table_files(table)):
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=100_000):
+                    writer.write_batch(batch)
+
+    def merge_error_logs(self, error_logs: list[Path]) -> int:
+        """Merge error tables sorted by dataset, file, and column and return the error count."""
+        records: list[dict[str, Any]] = []
+        for error_log in error_logs:
+            with error_log.open(encoding="utf-8") as file:
+                records.extend(json.loads(line) for line in file if line.strip())
+        records.sort(key=lambda record: tuple(str(record.get(key)) for key in ERROR_FIELDS))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with (self.output_dir / "error_list.jsonl").open("w", encoding="utf-8") as file:
+            file.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        return len(records)
+
+    def merge_quarantines(self, error_logs: list[Path]) -> int:
+        """Sum the strikes per file of the quarantine tables next to the error tables.
+
+        Returns the number of files with strikes, which later runs on the merged outputs skip
+        once they reach `--max-strikes`.
+        """
+        strikes: Counter[str] = Counter()
+        for error_log in error_logs:
+            # the quarantine table that `ErrorLog` of `enrich_profiles.py` keeps next to the log
+            path = error_log.with_name(f"{error_log.stem}.quarantine.jsonl")
+            if not path.exists():
+                continue
+            with path.open(encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        strikes[record["file"]] += record["strikes"]
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with (self.output_dir / "error_list.quarantine.jsonl").open("w", encoding="utf-8") as file:
+            file.writelines(
+                json.dumps({"file": key, "strikes": n}, ensure_ascii=False) + "\n"
+                for key, n in sorted(strikes.items())
+            )
+        return len(strikes)
+
+    def merge_download_errors(self, data_dirs: list[Path]) -> int:
+        """Merge the refs that failed to download and return their count."""
+        lines: set[str] = set()
+        for data_dir in data_dirs:
+            if (path := data_dir / "error_datasets.txt").exists():
+                lines.update(path.read_text(encoding="utf-8").splitlines())
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        (self.output_dir / "error_datasets.txt").write_text(
+            "".join(f"{line}\n" for line in sorted(lines)), encoding="utf-8"
+        )
+        return len(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="merge the outputs of sharded runs")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="../merged",
+        help="path for the merged outputs (default %(default)s)",
+    )
+    parser.add_argument(
+        "--metadata",
+        type=str,
+        nargs="+",
+        default=[],
+        help="metadata directories of the shards, merged into <output>/kaggle_metadata",
+    )
+    parser.add_argument(
+        "--results",
+        type=str,
+        nargs="+",
+        default=[],
+        help="result directories of the shards, merged into <output>/croissant",
+    )
+    parser.add_argument(
+        "--error-logs",
+        type=str,
+        nargs="+",
+        default=[],
+        help="error tables of the shards, merged into <output>/error_list.jsonl together with "
+        "their quarantine tables",
+    )
+    parser.add_argument(
+        "--data-dirs",
+        type=str,
+        nargs="+",
+        default=[],
+        help="data directories of the shards, whose download errors are merged into "
+        "<output>/error_datasets.txt",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    inputs = [Path(path) for path in args.metadata + args.results + args.error_logs]
+    if missing := [path for path in inputs if not path.exists()]:
+        print(f"Missing shard outputs: {', '.join(map(str, missing))}")
+        sys.exit(1)
+
+    merger = ShardMerger(Path(args.output))
+    if args.metadata:
+        count = merger.merge_metadata([Path(path) for path in args.metadata])
+        print(f"{count} datasets merged.")
+    if args.results:
+        count = merger.merge_results([Path(path) for path in args.results])
+        print(f"{count} enriched croissant files merged.")
+    if args.error_logs:
+        error_logs = [Path(path) for path in args.error_logs]
+        count = merger.merge_error_logs(error_logs)
+        print(f"{count} errors merged.")
+        count = merger.merge_quarantines(error_logs)
+        print(f"Strikes of {count} files merged.")
+    if args.data_dirs:
+        count = merger.merge_download_errors([Path(path) for path in args.data_dirs])
+        print(f"{count} download errors merged.")
+    if merger.conflicts:
+        print(f"{len(merger.conflicts)} refs appear in more than one shard: {merger.conflicts}")
+
+
+if __name__ == "__main__":
+    main()
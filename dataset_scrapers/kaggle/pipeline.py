@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import argparse
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from dataset_scrapers.kaggle.download_datasets import DatasetDownloader
+from dataset_scrapers.kaggle.download_metadata import KAGGLE_URL, MetadataDownloader
+from dataset_scrapers.kaggle.enrich_profiles import (
+    BASE_DIR,
+    HistogramCreator,
+    add_enrichment_arguments,
+    create_creator,
+    set_start_method,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+_DONE = object()
+
+
+class Pipeline:
+    """Stream refs through metadata download, filtering, dataset download, and enrichment.
+
+    The stages are connected by bounded queues, so a slow stage blocks the stages before it
+    instead of letting work pile up. Metadata and datasets are downloaded by thread pools of
+    their own size while the pool of the `HistogramCreator` enriches the datasets that are
+    already downloaded, so network, disk, and CPUs are busy at the same time.
+    """
+
+    def __init__(
+        self,
+        metadata_downloader: MetadataDownloader,
+        dataset_downloader: DatasetDownloader,
+        creator: HistogramCreator,
+        metadata_workers: int = 4,
+        download_workers: int = 2,
+        queue_size: int = 16,
+        max_size: float = 100.0,
+    ) -> None:
+        self.metadata_downloader = metadata_downloader
+        self.dataset_downloader = dataset_downloader
+        self.creator = creator
+        self.metadata_workers = metadata_workers
+        self.download_workers = download_workers
+        self.queue_size = queue_size
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.filtered = 0
+
+    def fetch(self, ref: str) -> Path | None:
+        """Download the metadata of a ref and return its path if the dataset should be kept."""
+        path = self.metadata_downloader.fetch_ref(ref)
+        if path is None:
+            return None
+        fulfilled, _ = self.dataset_downloader.conditions_fullfilled(path, self.max_size)
+        if not fulfilled:
+            with self.lock:
+                self.filtered += 1
+            return None
+        return path
+
+    def download(self, path: Path) -> Path | None:
+        """Download the dataset of a metadata file and return its directory on success."""
+        return path.parent if self.dataset_downloader.download_if_missing(path) else None
+
+    def stage(
+        self,
+        func: Callable[[Any], Any | None],
+        inputs: queue.Queue[Any],
+        outputs: queue.Queue[Any],
+        workers: int,
+    ) -> threading.Thread:
+        """Apply `func` to all inputs in `workers` threads and pass results that are not `None`.
+
+        Returns the thread that signals the end of the outputs once all workers are done.
+        """
+
+        def work() -> None:
+            while (item := inputs.get()) is not _DONE:
+                try:
+                    result = func(item)
+                except Exception as e:  # noqa: BLE001
+                    print(f"Exception occurred with {item}: {e}")
+                    continue
+                if result is not None:
+                    outputs.put(result)
+            # let the other workers of this stage stop as well
+            inputs.put(_DONE)
+
+        def run() -> None:
+            threads = [threading.Thread(target=work, daemon=True) for _ in range(workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            outputs.put(_DONE)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def run(self, refs: list[str]) -> None:
+        self.metadata_downloader.total_size = len(refs)
+        ref_queue: queue.Queue[Any] = queue.Queue(maxsize=self.queue_size)
+        metadata_queue: queue.Queue[Any] = queue.Queue(maxsize=self.queue_size)
+        dataset_queue: queue.Queue[Any] = queue.Queue(maxsize=self.queue_size)
+
+        def feed() -> None:
+            for ref in refs:
+                if self.metadata_downloader.rate_limited:
+                    break
+                ref_queue.put(ref)
+            ref_queue.put(_DONE)
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        threads = [
+            feeder,
+            self.stage(self.fetch, ref_queue, metadata_queue, self.metadata_workers),
+            self.stage(self.download, metadata_queue, dataset_queue, self.download_workers),
+        ]
+        self.creator.enrich(drain(dataset_queue))
+        for thread in threads:
+            thread.join()
+        self.print_stats()
+
+    def print_stats(self) -> None:
+        self.metadata_downloader.print_stats()
+        downloader = self.dataset_downloader
+        print(
+            f"{self.filtered} datasets filtered out, {downloader.downloaded} downloaded, "
+            f"{downloader.skipped} already downloaded, {downloader.failed} failed"
+        )
+        if downloader.session.retries:
+            print(downloader.session.summary())
+
+
+def drain(items: queue.Queue[Any]) -> Iterator[Any]:
+    while (item := items.get()) is not _DONE:
+        yield item
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="crawl, download and enrich kaggle datasets")
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default="../data",
+        help="path to create a data directory (default %(default)s)",
+    )
+    parser.add_argument(
+        "--metadata-dir",
+        type=str,
+        default=(BASE_DIR / "../kaggle_metadata"),
+        help="path for kaggle metadata and datasets (default %(default)s)",
+    )
+    parser.add_argument(
+        "-k",
+        "--keyword",
+        type=str,
+        default="",
+        help="a specific keyword to search for (default %(default)s)",
+    )
+    parser.add_argument(
+        "--refs",
+        type=str,
+        default=None,
+        help="path to a file with one ref per line to process instead of searching kaggle "
+        "(default: none)",
+    )
+    parser.add_argument(
+        "-i",
+        "--start-index",
+        type=int,
+        default=0,
+        help="index of the first ref to process (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-pages",
+        type=int,
+        default=100,
+        help="max number of result pages to search for a given keyword (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=float,
+        default=100.0,
+        help="skip datasets with larger archives in MB (default %(default)s)",
+    )
+    parser.add_argument(
+        "--base-url",
+        type=str,
+        default=None,
+        help="base URL of a kaggle stand-in for metadata and datasets (default: kaggle)",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="retries per request after rate limits, server errors and truncated "
+        "responses (default %(default)s)",
+    )
+    parser.add_argument(
+        "--metadata-workers",
+        type=int,
+        default=4,
+        help="number of threads that download metadata (default %(default)s)",
+    )
+    parser.add_argument(
+        "--download-workers",
+        type=int,
+        default=2,
+        help="number of threads that download datasets (default %(default)s)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=16,
+        help="max number of items waiting between two stages (default %(default)s)",
+    )
+    add_enrichment_arguments(parser)
+    return parser.parse_args()
+
+
+def main() -> None:
+    start = time.perf_counter()
+    args = parse_args()
+    set_start_method(args.start_method)
+    data_dir = Path(args.data_dir)
+    metadata_dir = Path(args.metadata_dir)
+    data_dir.mkdir(exist_ok=True, parents=True)
+    metadata_dir.mkdir(exist_ok=True, parents=True)
+
+    metadata_downloader = MetadataDownloader(
+        data_dir,
+        metadata_dir,
+        max_pages=args.max_pages,
+        base_url=args.base_url or KAGGLE_URL,
+        max_retries=args.max_retries,
+    )
+    dataset_downloader = DatasetDownloader(
+        metadata_dir, base_url=args.base_url, max_retries=args.max_retries
+    )
+    pipeline = Pipeline(
+        metadata_downloader,
+        dataset_downloader,
+        create_creator(args, metadata_dir),
+        metadata_workers=args.metadata_workers,
+        download_workers=args.download_workers,
+        queue_size=args.queue_size,
+        max_size=args.max_size,
+    )
+    if args.refs is not None:
+        with Path(args.refs).open(encoding="utf-8") as file:
+            refs = [line.strip() for line in file if line.strip()]
+    else:
+        refs = metadata_downloader.get_refs(args.keyword)
+    if args.shard is not None:
+        refs = args.shard.select(refs)
+    pipeline.run(refs[args.start_index :][: args.max_datasets])
+    print(f"Finished in {time.perf_counter() - start:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
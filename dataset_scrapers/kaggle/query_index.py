@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import sys
+import time
+from pathlib import Path
+
+from dataset_scrapers.profile_index import NUMERIC_TYPES, ProfileIndex
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="query a search index over column profiles")
+    parser.add_argument(
+        "--index",
+        type=str,
+        default=(BASE_DIR / "../profile_index"),
+        help="path to the index directory (default %(default)s)",
+    )
+    parser.add_argument(
+        "--types",
+        type=str,
+        nargs="+",
+        default=None,
+        help="only return columns of these data types, e.g. float or sc:Text, or 'numeric' "
+        "(default: all types)",
+    )
+    parser.add_argument(
+        "--overlaps",
+        type=float,
+        nargs=2,
+        metavar=("LOW", "HIGH"),
+        default=None,
+        help="only return columns whose value range overlaps [LOW, HIGH] (default: any range)",
+    )
+    parser.add_argument(
+        "--mean",
+        type=float,
+        default=None,
+        help="order columns by the distance of their mean to this value (default: none)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=math.inf,
+        help="only return columns whose mean is within this distance of --mean (default: any)",
+    )
+    ranking = parser.add_mutually_exclusive_group()
+    ranking.add_argument(
+        "--similar-to",
+        type=str,
+        nargs=3,
+        metavar=("DATASET", "FILE", "COLUMN"),
+        default=None,
+        help="order the matching columns by the similarity of their histogram to this column "
+        "(default: none)",
+    )
+    ranking.add_argument(
+        "--joinable-with",
+        type=str,
+        nargs=3,
+        metavar=("DATASET", "FILE", "COLUMN"),
+        default=None,
+        help="return the matching columns that likely share values with this column, ordered by "
+        "their estimated Jaccard similarity; requires MinHash signatures (default: none)",
+    )
+    parser.add_argument(
+        "--min-similarity",
+        type=float,
+        default=0.0,
+        help="minimum estimated Jaccard similarity for --joinable-with (default %(default)s)",
+    )
+    parser.add_argument(
+        "-k",
+        "--limit",
+        type=int,
+        default=10,
+        help="number of columns to print (default %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    index_dir = Path(args.index)
+    if not (index_dir / "meta.json").exists():
+        print("This program requires an index built by build_index.py to work!")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    index = ProfileIndex(index_dir)
+    print(
+        f"Opened index with {len(index)} columns in {1000 * (time.perf_counter() - start):.1f}ms"
+    )
+
+    types = args.types
+    if types is not None and "numeric" in types:
+        types = [t for t in types if t != "numeric"] + sorted(NUMERIC_TYPES)
+    start = time.perf_counter()
+    positions = index.filter(types, args.overlaps, args.mean, args.tolerance)
+    scores = None
+    score_name = "similarity"
+    if args.similar_to is not None:
+        query = index.find(*args.similar_to)
+        if len(query) == 0:
+            print(f"Column {args.similar_to} not found.")
+            sys.exit(1)
+        positions, scores = index.similar(int(query[0]), args.limit, candidates=positions)
+    elif args.joinable_with is not None:
+        query = index.find(*args.joinable_with)
+        if len(query) == 0:
+            print(f"Column {args.joinable_with} not found.")
+            sys.exit(1)
+        if index.num_perm is None:
+            print("This query requires an index built from profiles with MinHash signatures!")
+            sys.exit(1)
+        # without any filter, all columns are candidates and the LSH lookup alone decides
+        filtered = args.types is not None or args.overlaps is not None or args.mean is not None
+        positions, scores = index.joinable(
+            int(query[0]),
+            args.limit,
+            args.min_similarity,
+            candidates=positions if filtered else None,
+        )
+        score_name = "jaccard"
+    print(f"Found {len(positions)} columns in {1000 * (time.perf_counter() - start):.1f}ms")
+
+    for i, position in enumerate(positions[: args.limit]):
+        column = index.column(int(position))
+        if scores is not None:
+            column[score_name] = float(scores[i])
+        print(json.dumps(column))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing as mp
+import sqlite3
+import sys
+import time
+from collections import Counter
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import Any
+
+from tqdm import tqdm
+
+from dataset_scrapers.corpus_stats import CorpusStats, Distribution
+
+BASE_DIR = Path(__file__).resolve().parent
+# number of scanned profiles whose facts are written to the cache at once
+CACHE_BATCH_SIZE = 10_000
+UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+
+def parse_size(content_size: str) -> int | None:
+    """Convert a `contentSize` in the format `[size] [unit]` to bytes."""
+    parts = content_size.split()
+    if len(parts) != 2 or parts[1] not in UNITS:  # noqa: PLR2004
+        return None
+    try:
+        return round(float(parts[0]) * UNITS[parts[1]])
+    except ValueError:
+        return None
+
+
+def format_size(size: float) -> str:
+    for unit, multiplier in reversed(UNITS.items()):
+        if size >= multiplier:
+            return f"{size / multiplier:.4g} {unit}"
+    return f"{size:.0f} B"
+
+
+def profile_facts(path: Path) -> dict[str, Any]:
+    """Extract the facts that the statistics need from an enriched croissant file."""
+    data = path.read_bytes()
+    metadata = json.loads(data)
+    files = 0
+    archive_bytes = None
+    for item in metadata.get("distribution", []):
+        # same files as the ones that `enrich_profiles.py` profiles
+        if item.get("contentUrl", "").endswith((".csv", ".tsv")):
+            files += 1
+        # contentSize indicates size of .zip download file
+        if "contentSize" in item:
+            archive_bytes = parse_size(item["contentSize"])
+    columns = []
+    types: Counter[str] = Counter()
+    for record in metadata.get("recordSet", []):
+        fields = record.get("field", [])
+        columns.append(len(fields))
+        types.update(
+            column.get("dataType", ["unknown"])[0].rsplit(":", 1)[-1] for column in fields
+        )
+    return {
+        "files": files,
+        "columns": columns,
+        "types": dict(types),
+        "profile_bytes": len(data),
+        "archive_bytes": archive_bytes,
+    }
+
+
+def scan_profile(path: Path) -> tuple[Path, dict[str, Any] | None, str | None]:
+    try:
+        return path, profile_facts(path), None
+    except Exception as e:  # noqa: BLE001
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def stat_key(path: Path) -> str:
+    stat = path.stat()
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class FactCache:
+    """Persistent facts of enriched profiles, keyed by path, size and modification time.
+
+    Re-runs only parse the profiles that were added or rewritten since the last run, and the
+    facts of all other profiles are merged from the cache.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS facts (path TEXT PRIMARY KEY, key TEXT, facts TEXT)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def load(self) -> dict[str, tuple[str, str]]:
+        """Return the key and facts of all cached profiles by path."""
+        rows = self.connection.execute("SELECT path, key, facts FROM facts")
+        return {path: (key, facts) for path, key, facts in rows}
+
+    def put(self, rows: list[tuple[str, str, str]]) -> None:
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO facts VALUES (?, ?, ?)", rows)
+
+    def delete(self, paths: list[str]) -> None:
+        with self.connection:
+            self.connection.executemany("DELETE FROM facts WHERE path = ?", [(p,) for p in paths])
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class StatisticsReporter:
+    """Compute corpus statistics in one pass over the enriched profiles and the error log.
+
+    Profiles are parsed by a process pool while the error log is streamed in the main process,
+    and the facts of each profile are added to mergeable counters as they arrive.
+    """
+
+    def __init__(
+        self,
+        source_dir: Path,
+        error_log: Path,
+        cache: FactCache | None = None,
+        workers: int = mp.cpu_count(),
+    ) -> None:
+        self.source_dir = source_dir
+        self.error_log = error_log
+        self.cache = cache
+        self.workers = workers
+        self.parsed = 0
+        self.cached = 0
+        self.failed: list[tuple[Path, str]] = []
+
+    def count_errors(self, stats: CorpusStats) -> None:
+        if not self.error_log.exists():
+            print(f"No error log found at {self.error_log}")
+            return
+        with self.error_log.open(encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    stats.add_error(json.loads(line))
+
+    def start(self) -> CorpusStats:
+        stats = CorpusStats()
+        known = {} if self.cache is None else self.cache.load()
+        to_scan: list[Path] = []
+        unchanged: list[str] = []
+        for path in sorted(self.source_dir.glob("*.json")):
+            cached = known.pop(str(path), None)
+            key = stat_key(path)
+            if cached is not None and cached[0] == key:
+                unchanged.append(cached[1])
+            else:
+                to_scan.append(path)
+        if self.cache is not None and known:
+            # the profiles were removed since the last run
+            self.cache.delete(list(known))
+
+        with mp.Pool(self.workers) as pool:
+            results = pool.imap_unordered(scan_profile, to_scan, chunksize=64)
+            # the workers parse profiles while the cached facts and the error log are counted
+            for facts in unchanged:
+                stats.add_dataset(json.loads(facts))
+            self.cached = len(unchanged)
+            self.count_errors(stats)
+            rows: list[tuple[str, str, str]] = []
+            for path, scanned, error in tqdm(results, total=len(to_scan), desc="Scanning"):
+                if scanned is None:
+                    self.failed.append((path, str(error)))
+                    continue
+                stats.add_dataset(scanned)
+                self.parsed += 1
+                if self.cache is not None:
+                    rows.append((str(path), stat_key(path), json.dumps(scanned)))
+                    if len(rows) >= CACHE_BATCH_SIZE:
+                        self.cache.put(rows)
+                        rows = []
+            if self.cache is not None:
+                self.cache.put(rows)
+        return stats
+
+
+def error_lines(errors: Counter[str], total: int, label: str) -> list[str]:
+    count = sum(errors.values())
+    share = count / total if total else 0
+    lines = [f"- Total {label} errors: {count} ({share:.2%})"]
+    lines.extend(f"  - {n} {error_type}" for error_type, n in errors.most_common())
+    return lines
+
+
+def distribution_row(name: str, distribution: Distribution, sizes: bool = False) -> str:
+    if not distribution.count:
+        return f"| {name} |" + " - |" * 6
+    values = [
+        distribution.minimum,
+        distribution.quantile(0.5),
+        distribution.quantile(0.9),
+        distribution.quantile(0.99),
+        distribution.maximum,
+    ]
+    if sizes:
+        cells = [format_size(value) for value in [*values, distribution.mean]]
+    else:
+        # counts are integers, so the largest integer below a bound is a bound as well
+        cells = [str(math.floor(value)) for value in values] + [f"{distribution.mean:.2f}"]
+    return f"| {name} | " + " | ".join(cells) + " |"
+
+
+def render(stats: CorpusStats, day: date) -> str:
+    """Render the statistics in the format of `docs/statistics.md`."""
+    datasets = stats.files_per_dataset.count
+    files = int(stats.files_per_dataset.total)
+    columns = sum(stats.column_types.values())
+    record_files = stats.columns_per_file.count
+    lines = [
+        f"# Scraping Statistics (as of {day:%B} {day.day}, {day.year})",
+        "",
+        "## Kaggle",
+        "",
+        f"- Total Datasets: {datasets}",
+        f"- Total size of .zip files: {format_size(stats.archive_bytes.total)}",
+        f"- Total size of enriched profiles: {format_size(stats.profile_bytes.total)}",
+        "",
+        "### Files (.csv or .tsv)",
+        "",
+        f"- Total Files: {files}",
+        f"- Average Files per Dataset: {files / datasets if datasets else 0:.2f}",
+        *error_lines(stats.file_errors, files, "File"),
+        "",
+        "### Columns",
+        "",
+        f"- Total Columns: {columns}",
+        f"- Numeric Columns: {stats.numeric_columns}",
+        f"- Average Columns per File: {columns / record_files if record_files else 0:.1f}",
+        *error_lines(stats.column_errors, columns, "Columns"),
+        "",
+        "### Column Types",
+        "",
+        *(
+            f"- {data_type}: {n} ({n / columns:.2%})"
+            for data_type, n in stats.column_types.most_common()
+        ),
+        "",
+        "### Distributions",
+        "",
+        "Quantiles are upper bounds within 19% of the exact value.",
+        "",
+        "| | Min | Median | 90% | 99% | Max | Mean |",
+        "| --- | --- | --- | --- | --- | --- | --- |",
+        distribution_row("Files per dataset", stats.files_per_dataset),
+        distribution_row("Columns per file", stats.columns_per_file),
+        distribution_row("Size of .zip file", stats.archive_bytes, sizes=True),
+        distribution_row("Size of enriched profile", stats.profile_bytes, sizes=True),
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="report statistics of the enriched corpus")
+    parser.add_argument(
+        "--source",
+        type=str,
+        default=(BASE_DIR / "../croissant"),
+        help="path to the enriched profiles (default %(default)s)",
+    )
+    parser.add_argument(
+        "--error-log",
+        type=str,
+        default=(BASE_DIR / "../error_list.jsonl"),
+        help="path to the error table (default %(default)s)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="path to write the report as markdown, e.g. docs/statistics.md (default: print)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="path to a database with the facts of already scanned profiles, so that re-runs "
+        "only parse new or changed profiles (default: no cache)",
+    )
+    parser.add_argument(
+        "--json",
+        type=str,
+        default=None,
+        help="path to save the mergeable statistics as JSON (default: not saved)",
+    )
+    parser.add_argument(
+        "--merge",
+        type=str,
+        nargs="+",
+        default=[],
+        help="statistics saved with --json, e.g. by other nodes, to merge into the report",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=mp.cpu_count(),
+        help="number of processes that parse profiles (default %(default)s)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    start = time.perf_counter()
+    args = parse_args()
+    source_dir = Path(args.source)
+    if not source_dir.exists():
+        print("This program requires a directory with enriched croissant metadata to work!")
+        sys.exit(1)
+
+    cache = None if args.cache is None else FactCache(Path(args.cache))
+    reporter = StatisticsReporter(source_dir, Path(args.error_log), cache, args.workers)
+    try:
+        stats = reporter.start()
+    finally:
+        if cache is not None:
+            cache.close()
+    for path in args.merge:
+        stats.merge(CorpusStats.from_dict(json.loads(Path(path).read_text(encoding="utf-8"))))
+    if args.json is not None:
+        Path(args.json).write_text(json.dumps(stats.to_dict(), indent=2), encoding="utf-8")
+
+    report = render(stats, datetime.now(UTC).date())
+    if args.output is None:
+        print(report)
+    else:
+        Path(args.output).write_text(report, encoding="utf-8")
+        print(f"Saved report to {args.output}")
+    print(f"Parsed {reporter.parsed} profiles, took {reporter.cached} from the cache.")
+    for path, error in reporter.failed:
+        print(f"Error occurred with {path}: {error}")
+    print(f"Finished in {time.perf_counter() - start:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from openml import datasets
+from openml.exceptions import OpenMLServerException
+from tqdm import tqdm
+
+from dataset_scrapers.openml.tables import TABLES, table_rows
+from dataset_scrapers.serialization import PartitionedTableWriter
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from concurrent.futures import Future
+
+    import pandas as pd
+    from openml.datasets import OpenMLDataset
+
+# datasets that fail with server errors
+SERVER_ERRORS = [4537, 4546, 4562, 40864, 41190, 41949]
+# dataset profiles that are too large for MongoDB (> 16MB)
+TOO_LARGE = [41147, 42706, 42708, 44538, 44539, 44540, 44541, 44542]
+# error code for quality information not being available
+NO_QUALITIES = 362
+# attributes of `OpenMLDataset` that do not contain any data
+NO_DATA_ATTRIBUTES = {
+    "update_comment",
+    "data_pickle_file",
+    "data_feather_file",
+    "feather_attribute_file",
+}
+
+
+class DatasetCache:
+    """Persistent cache of converted OpenML datasets, keyed by dataset id.
+
+    Each entry stores a fingerprint of the catalog row that the dataset was fetched for, so
+    datasets are only fetched again once their catalog row changes, e.g. after a status change
+    or after OpenML computed their qualities.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS datasets "
+                "(did INTEGER PRIMARY KEY, fingerprint TEXT, record TEXT, fetched REAL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    def get(self, did: int, fingerprint: str) -> dict[str, Any] | None:
+        """Return the cached record of a dataset if it was fetched for the same catalog row."""
+        row = self.connection.execute(
+            "SELECT record FROM datasets WHERE did = ? AND fingerprint = ?", (did, fingerprint)
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put(self, did: int, fingerprint: str, record: dict[str, Any]) -> None:
+        self.connection.execute(
+            "INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?)",
+            (did, fingerprint, json.dumps(record), time.time()),
+        )
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def fingerprint(row: dict[str, Any]) -> str:
+    """Hash a catalog row to detect datasets that changed since they were cached."""
+    data = json.dumps(row, sort_keys=True, default=str).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def to_record(ds: OpenMLDataset, qualities: bool = True) -> dict[str, Any]:
+    """Convert a dataset to a JSON-serializable record with its features and qualities.
+
+    Pass `qualities=False` for datasets that were fetched without qualities, since accessing
+    `ds.qualities` would try to download them again.
+    """
+    record = {
+        key: value
+        for key, value in vars(ds).items()
+        if not key.startswith("_") and key not in NO_DATA_ATTRIBUTES
+    }
+    record["features"] = [vars(feature).copy() for feature in ds.features.values()]
+    record["qualities"] = ds.qualities if qualities else None
+    return record
+
+
+def to_profile(record: dict[str, Any]) -> dict[str, Any]:
+    """Select the attributes of a record that make up the JSON profile of a dataset."""
+    return {
+        "dataset_id": record["dataset_id"],
+        "name": record["name"],
+        "version": record["version"],
+        "description": record["description"],
+        "creator": record["creator"],
+        "contributor": record["contributor"],
+        "collection_date": record["collection_date"],
+        "upload_date": record["upload_date"],
+        "language": record["language"],
+        "license": record["licence"],
+        "default_target_attribute": record["default_target_attribute"],
+        "row_id_attribute": record["row_id_attribute"],
+        "ignore_attribute": record["ignore_attribute"],
+        "tags": record["tag"],
+        "features": [
+            {
+                "index": feature["index"],
+                "name": feature["name"],
+                "data_type": feature["data_type"],
+                "nominal_values": feature["nominal_values"],
+                "number_missing_values": feature["number_missing_values"],
+            }
+            for feature in record["features"]
+        ],
+        "qualities": record["qualities"],
+    }
+
+
+class ProfileDownloader:
+    """Download the profiles of all datasets in the OpenML catalog.
+
+    Datasets are fetched by a thread pool and converted to plain records right away, so the
+    `OpenMLDataset` objects do not pile up in memory. Records are cached per dataset id, so that
+    re-runs only fetch datasets that are new or changed, and are streamed into the profiles and
+    tables one by one.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        cache: DatasetCache,
+        workers: int = 8,
+        max_count: int | None = None,
+        refresh: bool = False,
+        output_format: str = "both",
+    ) -> None:
+        self.output_dir = output_dir
+        self.collection_dir = output_dir / "collection"
+        self.cache = cache
+        self.workers = workers
+        self.max_count = max_count
+        self.refresh = refresh
+        self.output_format = output_format
+        self.fetched = 0
+        self.cached = 0
+        self.errors: list[dict[str, Any]] = []
+
+    def catalog(self) -> pd.DataFrame:
+        oml_catalog = datasets.list_datasets(output_format="dataframe")
+        oml_catalog = oml_catalog[~oml_catalog.did.isin(SERVER_ERRORS + TOO_LARGE)]
+        oml_catalog = oml_catalog.iloc[: self.max_count]
+        oml_catalog.to_parquet(self.output_dir / "oml_catalog.pq", index=False)
+        return oml_catalog
+
+    def fetch(self, did: int) -> dict[str, Any]:
+        # the dataset is new or changed, so bypass the local cache of the openml client
+        try:
+            ds = datasets.get_dataset(
+                did,
+                download_qualities=True,
+                download_features_meta_data=True,
+                force_refresh_cache=True,
+            )
+        except OpenMLServerException as e:
+            if e.code != NO_QUALITIES:
+                raise
+            ds = datasets.get_dataset(
+                did,
+                download_qualities=False,
+                download_features_meta_data=True,
+                force_refresh_cache=True,
+            )
+            return to_record(ds, qualities=False)
+        return to_record(ds)
+
+    def records(self, oml_catalog: pd.DataFrame) -> Iterator[dict[str, Any]]:
+        """Yield the records of all datasets in the catalog, cached ones first.
+
+        Fetched records are yielded in the order in which they arrive and cached in the
+        calling thread, so the cache connection is never shared between threads. At most two
+        fetches per thread are in flight, and each record is released once it was yielded.
+        """
+        to_fetch: dict[int, str] = {}
+        for row in oml_catalog.to_dict("records"):
+            did, key = int(row["did"]), fingerprint(row)
+            record = None if self.refresh else self.cache.get(did, key)
+            if record is None:
+                to_fetch[did] = key
+            else:
+                self.cached += 1
+                yield record
+
+        with (
+            ThreadPoolExecutor(self.workers) as executor,
+            tqdm(total=len(to_fetch), desc="Fetching datasets") as progress,
+        ):
+            pending = iter(to_fetch)
+            futures: dict[Future[dict[str, Any]], int] = {}
+            while True:
+                for did in itertools.islice(pending, 2 * self.workers - len(futures)):
+                    futures[executor.submit(self.fetch, did)] = did
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    did = futures.pop(future)
+                    progress.update(1)
+                    try:
+                        record = future.result()
+                    except Exception as e:  # noqa: BLE001
+                        self.errors.append(
+                            {"did": did, "type": type(e).__name__, "message": str(e)}
+                        )
+                        continue
+                    self.cache.put(did, to_fetch[did], record)
+                    self.fetched += 1
+                    yield record
+
+    def write_profile(self, record: dict[str, Any]) -> None:
+        with (self.collection_dir / f"{record['dataset_id']}.json").open("w") as file:
+            json.dump(to_profile(record), file)
+
+    def start(self) -> None:
+        self.collection_dir.mkdir(parents=True, exist_ok=True)
+        writers = {}
+        if self.output_format != "json":
+            writers = {
+                name: PartitionedTableWriter(self.output_dir / name, schema)
+                for name, schema in TABLES.items()
+            }
+        try:
+            for record in self.records(self.catalog()):
+                if self.output_format != "parquet":
+                    self.write_profile(record)
+                if writers:
+                    # append the tables dataset by dataset instead of building them at the end
+                    for name, rows in table_rows(record).items():
+                        writers[name].add(rows)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        self.write_errors()
+        self.print_stats()
+
+    def write_errors(self) -> None:
+        with (self.output_dir / "errors.jsonl").open("w", encoding="utf-8") as file:
+            file.writelines(json.dumps(error) + "\n" for error in self.errors)
+
+    def print_stats(self) -> None:
+        print(
+            f"{self.fetched} datasets fetched, {self.cached} unchanged datasets taken from cache."
+        )
+        print(f"{len(self.errors)} errors occurred")
+        for error in self.errors:
+            print(f"{error['did']}: {error['type']}\n{error['message']}\n")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="download openml dataset profiles")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=Path(os.getenv("RAW_DATADIR", "../data")) / "openml",
+        help="path for the catalog, profiles and tables (default %(default)s)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default=None,
+        help="path to the dataset cache database (default: <output>/cache.sqlite)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=8,
+        help="number of threads that fetch datasets (default %(default)s)",
+    )
+    parser.add_argument(
+        "--max-datasets",
+        type=int,
+        default=None,
+        help="max count of datasets to be processed (default: all)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["json", "parquet", "both"],
+        default="both",
+        help="write a JSON profile per dataset, the dataset, feature, metric and tag tables, "
+        "or both (default %(default)s)",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="fetch all datasets again instead of taking unchanged ones from the cache",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    start = time.perf_counter()
+    args = parse_args()
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = DatasetCache(output_dir / "cache.sqlite" if args.cache is None else Path(args.cache))
+
+    downloader = ProfileDownloader(
+        output_dir,
+        cache,
+        workers=args.workers,
+        max_count=args.max_datasets,
+        refresh=args.refresh,
+        output_format=args.format,
+    )
+    try:
+        downloader.start()
+    finally:
+        cache.close()
+    print(f"Finished in {time.perf_counter() - start:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pyarrow as pa
+
+DATASET_SCHEMA = pa.schema(
+    [
+        ("dataset_id", pa.int64()),
+        ("name", pa.string()),
+        ("version", pa.int64()),
+        ("description", pa.string()),
+        ("collection_date", pa.string()),
+        ("upload_date", pa.string()),
+        ("language", pa.string()),
+        ("licence", pa.string()),
+        ("url", pa.string()),
+        ("default_target_attribute", pa.string()),
+        ("row_id_attribute", pa.string()),
+        ("version_label", pa.string()),
+        ("citation", pa.string()),
+        ("original_data_url", pa.string()),
+        ("paper_url", pa.string()),
+        ("md5_checksum", pa.string()),
+        ("data_file", pa.string()),
+        ("parquet_file", pa.string()),
+    ]
+)
+FEATURE_SCHEMA = pa.schema(
+    [
+        ("dataset_id", pa.int64()),
+        ("index", pa.int64()),
+        ("name", pa.string()),
+        ("data_type", pa.string()),
+        ("nominal_values", pa.list_(pa.string())),
+        ("number_missing_values", pa.int64()),
+        ("ontologies", pa.list_(pa.string())),
+        ("ignore", pa.bool_()),
+    ]
+)
+METRIC_SCHEMA = pa.schema(
+    [
+        ("dataset_id", pa.int64()),
+        ("metric", pa.string()),
+        ("value", pa.float64()),
+    ]
+)
+TAG_SCHEMA = pa.schema(
+    [
+        ("dataset_id", pa.int64()),
+        ("tag", pa.string()),
+    ]
+)
+# file names of the tables and their schemas
+TABLES = {
+    "datasets.pq": DATASET_SCHEMA,
+    "features.pq": FEATURE_SCHEMA,
+    "metrics.pq": METRIC_SCHEMA,
+    "tags.pq": TAG_SCHEMA,
+}
+
+
+def _string(value: Any) -> str | None:  # noqa: ANN401
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _strings(values: list[Any] | None) -> list[str] | None:
+    return None if values is None else [str(value) for value in values]
+
+
+def ignored_attributes(record: dict[str, Any]) -> list[str]:
+    ignore_attributes = record.get("ignore_attribute") or []
+    # a single entry may hold a comma-separated list of attributes
+    if len(ignore_attributes) == 1:
+        ignore_attributes = ignore_attributes[0].split(",")
+    return ignore_attributes
+
+
+def table_rows(record: dict[str, Any]) -> dict[str, list[dict[str, Any]]]:
+    """Normalize a dataset record into rows of each table in `TABLES`.
+
+    List and dict attributes (features, qualities, and tags) go to separate tables, and
+    attributes without data or with the same data for all datasets are dropped.
+    """
+    did = record["dataset_id"]
+    dataset = {
+        name: record.get(name) if name in {"dataset_id", "version"} else _string(record.get(name))
+        for name in DATASET_SCHEMA.names
+    }
+    ignored = set(ignored_attributes(record))
+    features = [
+        {
+            "dataset_id": did,
+            "index": feature["index"],
+            "name": feature["name"],
+            "data_type": feature["data_type"],
+            "nominal_values": _strings(feature.get("nominal_values")),
+            "number_missing_values": feature.get("number_missing_values"),
+            "ontologies": _strings(feature.get("ontologies")),
+            "ignore": feature["name"] in ignored,
+        }
+        for feature in record["features"]
+    ]
+    metrics = [
+        {"dataset_id": did, "metric": metric, "value": value}
+        for metric, value in (record.get("qualities") or {}).items()
+    ]
+    tags = record.get("tag") or []
+    if isinstance(tags, str):
+        tags = [tags]
+    return {
+        "datasets.pq": [dataset],
+        "features.pq": features,
+        "metrics.pq": metrics,
+        "tags.pq": [{"dataset_id": did, "tag": tag} for tag in tags],
+    }
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+import pickle  # noqa: S403
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+# connections inherited through fork, kept alive so that the child never closes them
+_inherited: list[sqlite3.Connection] = []
+
+
+class ProfileCache:
+    """Persistent, size-bounded cache for column profiles keyed by content hashes.
+
+    Entries live in a SQLite database so that all worker processes can share the cache. Each
+    process opens its own connection lazily, which allows passing the cache to pool initializers.
+    A connection inherited through `fork` is never used, since SQLite does not support that.
+    Eviction removes the least recently used entries until the cache fits into `max_bytes`.
+    """
+
+    def __init__(self, path: Path, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._connection: sqlite3.Connection | None = None
+        self._pid = os.getpid()
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state["_connection"] = None
+        return state
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        self._forget_inherited()
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS profiles "
+                "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, last_used REAL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS profiles_last_used ON profiles (last_used)"
+            )
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _forget_inherited(self) -> None:
+        if self._connection is not None and self._pid != os.getpid():
+            _inherited.append(self._connection)
+            self._connection = None
+
+    def get(self, key: str) -> Any | None:  # noqa: ANN401
+        row = self.connection.execute(
+            "SELECT value FROM profiles WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.connection.execute(
+            "UPDATE profiles SET last_used = ? WHERE key = ?", (time.time(), key)
+        )
+        return pickle.loads(row[0])  # noqa: S301
+
+    def put(self, key: str, value: Any) -> None:  # noqa: ANN401
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?)",
+            (key, blob, len(blob), time.time()),
+        )
+
+    def evict(self) -> int:
+        """Drop the least recently used entries beyond `max_bytes` and return their number."""
+        cursor = self.connection.execute(
+            "DELETE FROM profiles WHERE key IN ("
+            "SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY last_used DESC) AS total "
+            "FROM profiles) WHERE total > ?)",
+            (self.max_bytes,),
+        )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        self._forget_inherited()
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
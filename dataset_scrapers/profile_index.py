@@ -0,0 +1,469 @@
+from __future__ import annotations
+
+import json
+import math
+import shutil
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from dataset_scrapers.sketches import band_hashes
+
+if TYPE_CHECKING:
+    from collections.abc import Collection, Sequence
+    from pathlib import Path
+    from typing import BinaryIO
+
+STATISTICS = (
+    "count",
+    "mean",
+    "std",
+    "min",
+    "first_quartile",
+    "second_quartile",
+    "third_quartile",
+    "max",
+)
+# per-column arrays and their types; each array is a flat file that is memory-mapped on load
+ARRAYS: dict[str, type[np.generic]] = {
+    "dataset": np.int32,
+    "file": np.int32,
+    "type": np.uint8,
+    "n_unique": np.int64,
+    "shape": np.float32,
+    "bin_offsets": np.int64,
+    "bins": np.float64,
+    "density_offsets": np.int64,
+    "densities": np.float64,
+    **dict.fromkeys(STATISTICS, np.float64),
+}
+# the means in ascending order and the positions of their columns, for range lookups by mean
+SORTED_ARRAYS: dict[str, type[np.generic]] = {
+    "mean_order": np.int64,
+    "mean_sorted": np.float64,
+}
+# MinHash signatures of the columns that have one and the positions of these columns
+SIGNATURE_ARRAYS: dict[str, type[np.generic]] = {
+    "signature_positions": np.int64,
+    "signatures": np.uint32,
+}
+# per LSH band, the sorted bucket keys of all signatures and the signatures in the same order
+LSH_ARRAYS: dict[str, type[np.generic]] = {
+    "lsh_keys": np.uint64,
+    "lsh_order": np.int64,
+}
+STRING_TABLES = ("datasets", "files", "columns")
+NUMERIC_TYPES = {"int", "integer", "float"}
+
+
+def resample(bins: Sequence[float], densities: Sequence[float], n_bins: int) -> np.ndarray:
+    """Redistribute the masses of a histogram to `n_bins` equal-width bins over the same range.
+
+    The result sums to 1, so histograms with different bin counts become comparable.
+    """
+    edges = np.asarray(bins, dtype=np.float64)
+    masses = np.nan_to_num(np.asarray(densities, dtype=np.float64))
+    total = masses.sum()
+    if total <= 0 or len(edges) != len(masses) + 1:
+        return np.zeros(n_bins, dtype=np.float32)
+    if len(masses) != n_bins:
+        cdf = np.concatenate(([0.0], np.cumsum(masses)))
+        masses = np.diff(np.interp(np.linspace(edges[0], edges[-1], n_bins + 1), edges, cdf))
+    shape: np.ndarray = (masses / total).astype(np.float32)
+    return shape
+
+
+class _StringTableWriter:
+    def __init__(self, path: Path) -> None:
+        self.data = (path.parent / f"{path.name}.bytes").open("wb")
+        self.offsets = (path.parent / f"{path.name}.offsets").open("wb")
+        self.offset = 0
+        self.pending = [0]
+        self.count = 0
+
+    def add(self, value: str) -> int:
+        encoded = value.encode()
+        self.data.write(encoded)
+        self.offset += len(encoded)
+        self.pending.append(self.offset)
+        self.count += 1
+        return self.count - 1
+
+    def flush(self) -> None:
+        np.asarray(self.pending, dtype=np.int64).tofile(self.offsets)
+        self.pending = []
+
+    def close(self) -> None:
+        self.flush()
+        self.data.close()
+        self.offsets.close()
+
+
+class StringTable:
+    """Memory-mapped list of strings, stored as UTF-8 bytes and an offset array."""
+
+    def __init__(self, path: Path) -> None:
+        self.data = _load(path.parent / f"{path.name}.bytes", np.uint8)
+        self.offsets = _load(path.parent / f"{path.name}.offsets", np.int64)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes().decode()
+
+
+def _load(path: Path, dtype: type[np.generic]) -> np.ndarray:
+    # empty files cannot be memory-mapped
+    if path.stat().st_size == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+
+class ProfileIndexWriter:
+    """Pack column profiles into contiguous arrays for `ProfileIndex`.
+
+    Columns are buffered and appended to one flat file per array every `batch_size` columns, so
+    an index over millions of columns is built with flat memory. The index is written next to
+    `path` and moved into place on `close`, so an interrupted build never replaces an index.
+    MinHash signatures are split into `bands` bands, which are hashed into one sorted LSH table
+    per band on `close`.
+    """
+
+    def __init__(
+        self, path: Path, n_bins: int = 16, bands: int = 32, batch_size: int = 100_000
+    ) -> None:
+        self.path = path
+        self.partial = path.parent / f".{path.name}.partial"
+        self.n_bins = n_bins
+        self.bands = bands
+        self.batch_size = batch_size
+        self.num_perm: int | None = None
+        shutil.rmtree(self.partial, ignore_errors=True)
+        self.partial.mkdir(parents=True)
+        self.files: dict[str, BinaryIO] = {
+            name: (self.partial / f"{name}.bin").open("wb") for name in ARRAYS | SIGNATURE_ARRAYS
+        }
+        self.strings = {name: _StringTableWriter(self.partial / name) for name in STRING_TABLES}
+        self.datasets: dict[str, int] = {}
+        self.file_ids: dict[tuple[str, str], int] = {}
+        self.types: dict[str, int] = {}
+        self.buffers: dict[str, list[Any]] = {name: [] for name in ARRAYS | SIGNATURE_ARRAYS}
+        self.buffers["bin_offsets"].append(0)
+        self.buffers["density_offsets"].append(0)
+        self.n_bins_total = 0
+        self.n_densities_total = 0
+        self.count = 0
+
+    def add(self, rows: list[dict[str, Any]]) -> None:
+        """Add rows in the format of `column_rows` or of the column profile table."""
+        buffers = self.buffers
+        for row in rows:
+            dataset = str(row["dataset"])
+            if (dataset_id := self.datasets.get(dataset)) is None:
+                dataset_id = self.datasets[dataset] = self.strings["datasets"].add(dataset)
+            file_key = (dataset, str(row.get("file")))
+            if (file_id := self.file_ids.get(file_key)) is None:
+                file_id = self.file_ids[file_key] = self.strings["files"].add(file_key[1])
+            data_type = str(row.get("data_type"))
+            if (type_id := self.types.get(data_type)) is None:
+                type_id = self.types[data_type] = len(self.types)
+            self.strings["columns"].add(str(row.get("column")))
+
+            buffers["dataset"].append(dataset_id)
+            buffers["file"].append(file_id)
+            buffers["type"].append(type_id)
+            n_unique = row.get("n_unique")
+            buffers["n_unique"].append(
+                -1 if n_unique is None or math.isnan(n_unique) else int(n_unique)
+            )
+            for name in STATISTICS:
+                value = row.get(name)
+                buffers[name].append(math.nan if value is None else float(value))
+
+            bins, densities = row.get("bins"), row.get("densities")
+            if bins is None or densities is None or any(_missing(v) for v in (*bins, *densities)):
+                bins, densities = [], []
+            buffers["bins"].extend(bins)
+            buffers["densities"].extend(densities)
+            self.n_bins_total += len(bins)
+            self.n_densities_total += len(densities)
+            buffers["bin_offsets"].append(self.n_bins_total)
+            buffers["density_offsets"].append(self.n_densities_total)
+            buffers["shape"].append(np.sqrt(resample(bins, densities, self.n_bins)))
+
+            if (signature := row.get("minhash")) is not None:
+                self.add_signature(signature)
+            self.count += 1
+        if len(buffers["dataset"]) >= self.batch_size:
+            self.flush()
+
+    def add_signature(self, signature: list[int]) -> None:
+        if self.num_perm is None:
+            self.num_perm = len(signature)
+        elif len(signature) != self.num_perm:
+            raise ValueError(
+                f"Cannot index MinHash signatures of {len(signature)} and {self.num_perm} "
+                "permutations together"
+            )
+        self.buffers["signature_positions"].append(self.count)
+        self.buffers["signatures"].extend(signature)
+
+    def flush(self) -> None:
+        for name, values in self.buffers.items():
+            if name == "shape":
+                array = np.asarray(values, dtype=ARRAYS[name]).reshape(-1, self.n_bins)
+            else:
+                array = np.asarray(values, dtype=(ARRAYS | SIGNATURE_ARRAYS)[name])
+            array.tofile(self.files[name])
+            values.clear()
+        for table in self.strings.values():
+            table.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        for table in self.strings.values():
+            table.close()
+        means = np.fromfile(self.partial / "mean.bin", dtype=np.float64)
+        order = np.argsort(means, kind="stable")
+        order.tofile(self.partial / "mean_order.bin")
+        means[order].tofile(self.partial / "mean_sorted.bin")
+        bands = self.write_lsh()
+        meta = {
+            "columns": self.count,
+            "bins": self.n_bins,
+            "types": list(self.types),
+            "statistics": list(STATISTICS),
+            "minhash": {"permutations": self.num_perm, "bands": bands},
+        }
+        (self.partial / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.partial.rename(self.path)
+
+    def write_lsh(self) -> int:
+        """Write the LSH table of each band of the signatures and return the band count."""
+        bands = 0 if self.num_perm is None else min(self.bands, self.num_perm)
+        with (
+            (self.partial / "lsh_keys.bin").open("wb") as keys_file,
+            (self.partial / "lsh_order.bin").open("wb") as order_file,
+        ):
+            if self.num_perm is None:
+                return bands
+            rows = self.num_perm // bands
+            signatures = _load(self.partial / "signatures.bin", np.uint32)
+            signatures = signatures.reshape(-1, self.num_perm)
+            for band in range(bands):
+                keys = band_hashes(signatures[:, band * rows : (band + 1) * rows])
+                order = np.argsort(keys)
+                keys[order].tofile(keys_file)
+                order.tofile(order_file)
+        return bands
+
+
+def _missing(value: Any) -> bool:  # noqa: ANN401
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+class ProfileIndex:
+    """Memory-mapped index of column profiles for vectorized dataset search queries.
+
+    Opening an index only maps its files, so queries can start right away and the operating
+    system pages in the arrays that a query actually scans. Columns are identified by their
+    position in the index; `column` maps a position back to its dataset, file, and profile.
+    If the profiles have MinHash signatures, `joinable` finds columns with overlapping values.
+    """
+
+    def __init__(self, path: Path, chunk_size: int = 1_000_000) -> None:
+        self.path = path
+        self.chunk_size = chunk_size
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        self.n_bins: int = meta["bins"]
+        self.types: list[str] = meta["types"]
+        minhash = meta.get("minhash", {})
+        self.num_perm: int | None = minhash.get("permutations")
+        self.bands: int = minhash.get("bands", 0)
+        arrays = ARRAYS | SORTED_ARRAYS
+        if self.num_perm is not None:
+            arrays |= SIGNATURE_ARRAYS | LSH_ARRAYS
+        self.arrays = {name: _load(path / f"{name}.bin", dtype) for name, dtype in arrays.items()}
+        self.arrays["shape"] = self.arrays["shape"].reshape(-1, self.n_bins)
+        if self.num_perm is not None:
+            self.arrays["signatures"] = self.arrays["signatures"].reshape(-1, self.num_perm)
+            self.arrays["lsh_keys"] = self.arrays["lsh_keys"].reshape(self.bands, -1)
+            self.arrays["lsh_order"] = self.arrays["lsh_order"].reshape(self.bands, -1)
+        self.strings = {name: StringTable(path / name) for name in STRING_TABLES}
+
+    def __len__(self) -> int:
+        return len(self.arrays["dataset"])
+
+    def type_codes(self, data_types: Collection[str]) -> list[int]:
+        """Return the codes of data types, given with (`sc:Float`) or without (`float`) prefix."""
+        names = {data_type.rsplit(":", 1)[-1].lower() for data_type in data_types}
+        return [i for i, t in enumerate(self.types) if t.rsplit(":", 1)[-1].lower() in names]
+
+    def filter(
+        self,
+        data_types: Collection[str] | None = None,
+        overlaps: tuple[float, float] | None = None,
+        mean: float | None = None,
+        tolerance: float = math.inf,
+    ) -> np.ndarray:
+        """Return the positions of columns that match all given conditions.
+
+        Args:
+            data_types: Keep columns of these types. Use `NUMERIC_TYPES` for numeric columns.
+            overlaps: Keep columns whose value range overlaps this closed interval.
+            mean: Keep columns whose mean lies within `tolerance` of this value and order the
+                result by the distance of the mean, closest first.
+            tolerance: Maximum distance of the mean.
+        """
+        arrays = self.arrays
+        positions = None
+        if mean is not None and math.isfinite(tolerance):
+            # the sorted means narrow a query down to a window before any column is scanned
+            start = np.searchsorted(arrays["mean_sorted"], mean - tolerance, side="left")
+            end = np.searchsorted(arrays["mean_sorted"], mean + tolerance, side="right")
+            positions = np.sort(arrays["mean_order"][start:end])
+
+        def take(name: str) -> np.ndarray:
+            return arrays[name] if positions is None else arrays[name][positions]
+
+        mask = np.ones(len(self) if positions is None else len(positions), dtype=bool)
+        if data_types is not None:
+            lookup = np.zeros(max(len(self.types), 1), dtype=bool)
+            lookup[self.type_codes(data_types)] = True
+            mask &= lookup[take("type")]
+        if overlaps is not None:
+            low, high = overlaps
+            mask &= take("min") <= high
+            mask &= take("max") >= low
+        result = np.flatnonzero(mask) if positions is None else positions[mask]
+        if mean is None:
+            return result
+        distance = np.abs(arrays["mean"][result] - mean)
+        keep = distance <= tolerance
+        result, distance = result[keep], distance[keep]
+        return result[np.argsort(distance)]
+
+    def similar(
+        self,
+        query: int | tuple[Sequence[float], Sequence[float]],
+        k: int = 10,
+        candidates: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return the `k` columns with the most similar histograms and their similarities.
+
+        Histograms are compared by their shape, i.e. their masses over equal-width bins of their
+        own range. The index stores the square roots of the masses, so the similarity is a dot
+        product that equals the Bhattacharyya coefficient (1 for identical shapes, 0 for disjoint
+        ones). The query is a column position or a histogram given as bins and densities.
+        `candidates` restricts the search to some positions, e.g. the result of `filter`.
+        """
+        shapes = self.arrays["shape"]
+        if isinstance(query, int):
+            target = np.asarray(shapes[query])
+        else:
+            target = np.sqrt(resample(*query, self.n_bins))
+        if candidates is None:
+            positions = None
+            scores = np.empty(len(self), dtype=np.float32)
+            for start in range(0, len(self), self.chunk_size):
+                chunk = shapes[start : start + self.chunk_size]
+                scores[start : start + len(chunk)] = chunk @ target
+        else:
+            positions = np.asarray(candidates)
+            scores = shapes[positions] @ target
+        if isinstance(query, int):
+            # a column is not its own neighbor
+            scores[query if positions is None else positions == query] = 0
+        k = min(k, len(scores))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        # columns without histograms have no mass and match nothing
+        top = top[scores[top] > 0]
+        return (top if positions is None else positions[top]), scores[top]
+
+    def joinable(
+        self,
+        query: int,
+        k: int = 10,
+        min_similarity: float = 0.0,
+        candidates: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return up to `k` columns that likely share values with a column and their similarity.
+
+        The similarity is the Jaccard similarity of the distinct values, estimated from the
+        MinHash signatures. Only columns that fall into the same bucket as the query in at least
+        one LSH band are compared, and each band is looked up by a binary search, so a query
+        does not scan the index. With `b` bands of `r` rows, columns with a similarity `s` are
+        found with a probability of `1 - (1 - s^r)^b`. `candidates` restricts the result to
+        some positions, e.g. the result of `filter`.
+        """
+        if self.num_perm is None:
+            raise ValueError("The index has no MinHash signatures, enrich with --minhash first")
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        positions = self.arrays["signature_positions"]
+        row = int(np.searchsorted(positions, query))
+        if row == len(positions) or positions[row] != query:
+            return empty
+        signatures = self.arrays["signatures"]
+        target = np.asarray(signatures[row])
+        rows_per_band = self.num_perm // self.bands
+        matches = []
+        for band in range(self.bands):
+            columns = slice(band * rows_per_band, (band + 1) * rows_per_band)
+            key = band_hashes(target[np.newaxis, columns])[0]
+            keys = self.arrays["lsh_keys"][band]
+            start = np.searchsorted(keys, key, side="left")
+            end = np.searchsorted(keys, key, side="right")
+            matches.append(self.arrays["lsh_order"][band][start:end])
+        rows = np.unique(np.concatenate(matches))
+        # a column is not its own neighbor
+        rows = rows[rows != row]
+        if candidates is not None:
+            rows = rows[np.isin(positions[rows], candidates)]
+        if len(rows) == 0:
+            return empty
+        scores = (signatures[rows] == target).mean(axis=1)
+        order = np.argsort(-scores, kind="stable")
+        order = order[scores[order] >= min_similarity][:k]
+        return positions[rows[order]], scores[order]
+
+    def find(self, dataset: str, file: str | None = None, column: str | None = None) -> np.ndarray:
+        """Return the positions of the columns of a dataset, optionally of one file or column."""
+        datasets = self.strings["datasets"]
+        dataset_ids = [i for i in range(len(datasets)) if datasets[i] == dataset]
+        positions = np.flatnonzero(np.isin(self.arrays["dataset"], dataset_ids))
+        if file is not None:
+            files = self.strings["files"]
+            positions = positions[[files[int(self.arrays["file"][i])] == file for i in positions]]
+        if column is not None:
+            columns = self.strings["columns"]
+            positions = positions[[columns[int(i)] == column for i in positions]]
+        return positions
+
+    def column(self, i: int) -> dict[str, Any]:
+        """Return the dataset, file, name, type, and profile of the column at position `i`."""
+        arrays = self.arrays
+        bins = arrays["bins"][arrays["bin_offsets"][i] : arrays["bin_offsets"][i + 1]]
+        densities = arrays["densities"][
+            arrays["density_offsets"][i] : arrays["density_offsets"][i + 1]
+        ]
+        n_unique = int(arrays["n_unique"][i])
+        return {
+            "dataset": self.strings["datasets"][int(arrays["dataset"][i])],
+            "file": self.strings["files"][int(arrays["file"][i])],
+            "column": self.strings["columns"][i],
+            "dataType": self.types[int(arrays["type"][i])],
+            "statistics": {
+                name: float(arrays[name][i])
+                for name in STATISTICS
+                if not math.isnan(arrays[name][i])
+            },
+            "nUnique": None if n_unique < 0 else n_unique,
+            "histogram": {"bins": bins.tolist(), "densities": densities.tolist()},
+        }
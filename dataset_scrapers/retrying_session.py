@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import Counter
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+
+import requests
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryingSession:
+    """HTTP session that retries rate-limited, failed, and truncated GET requests.
+
+    Rate-limited responses are retried after their `Retry-After` header, other failures after an
+    exponential backoff with jitter. The session is shared by all threads of a crawler and counts
+    the retries per reason, so that crawls can report how they recovered.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff: float = 1.0,
+        max_wait: float = 60.0,
+        timeout: float = 20.0,
+        auth: tuple[str, str] | None = None,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.lock = threading.Lock()
+        self.retries: Counter[str] = Counter()
+        self.waited = 0.0
+
+    def get(self, url: str) -> requests.Response:
+        """Return the first response that needs no retry, or the last one if all attempts fail.
+
+        Raises:
+            requests.RequestException: If the last attempt fails without a response.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+                # reading the body here turns truncated responses into retryable errors
+                _ = response.content
+            except (
+                requests.ConnectionError,
+                requests.Timeout,
+                requests.exceptions.ChunkedEncodingError,
+            ) as e:
+                if attempt >= self.max_retries:
+                    raise
+                reason, wait = type(e).__name__, self.backoff_time(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                reason, wait = str(response.status_code), self.retry_after(response, attempt)
+            with self.lock:
+                self.retries[reason] += 1
+                self.waited += wait
+            time.sleep(wait)
+            attempt += 1
+
+    def backoff_time(self, attempt: int) -> float:
+        jitter = random.uniform(0.5, 1.5)  # noqa: S311
+        return min(self.backoff * 2.0**attempt * jitter, self.max_wait)
+
+    def retry_after(self, response: requests.Response, attempt: int) -> float:
+        """Return the wait time requested by the server, falling back to the backoff."""
+        header = response.headers.get("Retry-After")
+        if header is None:
+            return self.backoff_time(attempt)
+        try:
+            wait = float(header)
+        except ValueError:
+            try:
+                wait = (parsedate_to_datetime(header) - datetime.now(UTC)).total_seconds()
+            except (TypeError, ValueError):
+                return self.backoff_time(attempt)
+        return min(max(wait, 0.0), self.max_wait)
+
+    def summary(self) -> str:
+        reasons = ", ".join(f"{count} x {reason}" for reason, count in self.retries.most_common())
+        return f"Retried {self.retries.total()} requests ({reasons}), waited {self.waited:.1f}s"
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import json
+import math
+import shutil
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+COLUMN_SCHEMA = pa.schema(
+    [
+        ("dataset", pa.string()),
+        ("file", pa.string()),
+        ("column", pa.string()),
+        ("column_index", pa.int32()),
+        ("data_type", pa.string()),
+        ("count", pa.float64()),
+        ("mean", pa.float64()),
+        ("std", pa.float64()),
+        ("min", pa.float64()),
+        ("first_quartile", pa.float64()),
+        ("second_quartile", pa.float64()),
+        ("third_quartile", pa.float64()),
+        ("max", pa.float64()),
+        ("bins", pa.list_(pa.float64())),
+        ("densities", pa.list_(pa.float64())),
+        ("n_unique", pa.int64()),
+        ("most_common_values", pa.list_(pa.string())),
+        ("most_common_counts", pa.list_(pa.int64())),
+        ("min_date", pa.string()),
+        ("max_date", pa.string()),
+        ("minhash", pa.list_(pa.int64())),
+        ("error", pa.string()),
+    ]
+)
+
+_STATISTICS = {
+    "count": "count",
+    "mean": "mean",
+    "std": "std",
+    "min": "min",
+    "firstQuartile": "first_quartile",
+    "secondQuartile": "second_quartile",
+    "thirdQuartile": "third_quartile",
+    "max": "max",
+}
+
+
+def _float(value: float) -> float | str | None:
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return None
+    return value
+
+
+def _floats(values: list[Any] | None) -> list[float | None] | None:
+    if values is None:
+        return None
+    return [v if isinstance(v, int | float) else None for v in values]
+
+
+def to_json(obj: Any) -> Any:  # noqa: ANN401, C901
+    """Convert an object into JSON-compatible Python types in a single pass.
+
+    NumPy and pandas scalars and arrays are converted to their Python counterparts, NaN becomes
+    `"NaN"`, infinite values become `None`, and dicts with non-finite float keys are dropped.
+    """
+    if obj is None or isinstance(obj, str | bool | int):
+        return obj
+    if isinstance(obj, float | np.floating):
+        return _float(float(obj))
+    if isinstance(obj, dict):
+        if any(isinstance(k, float) and not math.isfinite(k) for k in obj):
+            return {}
+        return {to_json(k) if isinstance(k, np.generic) else k: to_json(v) for k, v in obj.items()}
+    if isinstance(obj, list | tuple):
+        return [to_json(item) for item in obj]
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == "f" and np.isfinite(obj).all():
+            return obj.tolist()
+        return [to_json(item) for item in obj.tolist()]
+    if isinstance(obj, np.generic):
+        return to_json(obj.item())
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, datetime | date | pd.Timestamp):
+        return obj.isoformat()
+    return obj
+
+
+def dump_json(obj: Any, path: Path, indent: int | None = None) -> None:  # noqa: ANN401
+    """Write JSON-compatible data with the C encoder, compact unless `indent` is given."""
+    separators = (",", ":") if indent is None else None
+    text = json.dumps(
+        obj, indent=indent, separators=separators, ensure_ascii=False, allow_nan=False
+    )
+    path.write_text(text, encoding="utf-8")
+
+
+def column_rows(dataset: str, metadata: dict[str, Any]) -> list[dict[str, Any]]:
+    """Flatten the column profiles of an enriched dataset into rows of `COLUMN_SCHEMA`."""
+    rows = []
+    for record in metadata.get("recordSet", []):
+        for i, column in enumerate(record["field"]):
+            statistics = column.get("statistics", {})
+            histogram = column.get("histogram", {})
+            most_common = column.get("mostCommon", column.get("counts", {}))
+            row: dict[str, Any] = {
+                "dataset": dataset,
+                "file": record.get("@id"),
+                "column": column.get("name"),
+                "column_index": i,
+                "data_type": column.get("dataType", [None])[0],
+                "bins": _floats(histogram.get("bins")),
+                "densities": _floats(histogram.get("densities")),
+                "n_unique": column.get("nUnique", column.get("uniqueDates")),
+                "most_common_values": [str(k) for k in most_common] or None,
+                "most_common_counts": list(most_common.values()) or None,
+                "min_date": column.get("minDate"),
+                "max_date": column.get("maxDate"),
+                "minhash": column.get("minhash"),
+                "error": column.get("error"),
+            }
+            for key, name in _STATISTICS.items():
+                value = statistics.get(key)
+                row[name] = value if isinstance(value, int | float) else None
+            rows.append(row)
+    return rows
+
+
+def table_files(path: Path) -> list[Path]:
+    """Return the files of a Parquet table that is stored as one file or as a directory."""
+    if path.is_dir():
+        # readers skip hidden files, so unfinished parts are left out
+        return sorted(part for part in path.glob("*.parquet") if not part.name.startswith("."))
+    return [path]
+
+
+def drop_rows(path: Path, column: str, values: set[str]) -> int:
+    """Rewrite a Parquet file without the rows whose `column` is in `values`.
+
+    The file is replaced once the rewrite is complete. Returns the number of dropped rows.
+    """
+    table = pq.read_table(path)
+    value_set = pa.array(sorted(values), type=table.schema.field(column).type)
+    kept = table.filter(pc.invert(pc.is_in(table[column], value_set=value_set)))
+    partial = path.with_name(f".{path.name}")
+    pq.write_table(kept, partial, compression="zstd")
+    partial.replace(path)
+    dropped: int = table.num_rows - kept.num_rows
+    return dropped
+
+
+def supersede_rows(part: Path, owners: dict[str, Path], column: str = "dataset") -> int:
+    """Drop the rows of earlier parts of a table for the datasets that a new `part` holds.
+
+    `owners` maps every dataset to the part that holds its rows and is updated to `part`, so the
+    rows of a dataset written several times are kept from the last part only. Returns the number
+    of datasets whose earlier rows were dropped.
+    """
+    stale: dict[Path, set[str]] = {}
+    for dataset in set(pq.read_table(part, columns=[column])[column].to_pylist()):
+        if (owner := owners.get(dataset)) is not None and owner != part:
+            stale.setdefault(owner, set()).add(dataset)
+        owners[dataset] = part
+    for owner, datasets in stale.items():
+        drop_rows(owner, column, datasets)
+    return sum(len(datasets) for datasets in stale.values())
+
+
+class ColumnTableWriter:
+    """Append column profiles to a Parquet table, one row group per `batch_size` rows.
+
+    An `atomic` table is written under a hidden name and renamed to `path` once closed, so that
+    readers of a directory of parts skip it until it is complete.
+    """
+
+    def __init__(self, path: Path, batch_size: int = 100_000, atomic: bool = False) -> None:
+        self.path = path
+        self.partial = path.with_name(f".{path.name}") if atomic else path
+        self.batch_size = batch_size
+        self.rows: list[dict[str, Any]] = []
+        self.writer = pq.ParquetWriter(self.partial, COLUMN_SCHEMA, compression="zstd")
+
+    def add(self, dataset: str, metadata: dict[str, Any]) -> None:
+        self.rows.extend(column_rows(dataset, metadata))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.rows:
+            self.writer.write_table(pa.Table.from_pylist(self.rows, schema=COLUMN_SCHEMA))
+            self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        self.writer.close()
+        if self.partial != self.path:
+            self.partial.rename(self.path)
+
+
+class PartitionedTableWriter:
+    """Append rows to a Parquet table that is stored as a directory of files.
+
+    Every `batch_size` rows are written to a file of their own with a single row group. Files are
+    renamed into place once complete, so the table stays readable with `pd.read_parquet` or
+    `pq.read_table` and holds all flushed rows even if the process dies before `close`.
+    """
+
+    def __init__(self, path: Path, schema: pa.Schema, batch_size: int = 100_000) -> None:
+        self.path = path
+        self.schema = schema
+        self.batch_size = batch_size
+        self.rows: list[dict[str, Any]] = []
+        self.parts = 0
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink(missing_ok=True)
+        path.mkdir(parents=True)
+        # start with an empty part, so that the table has its schema before any rows arrive
+        self.flush()
+
+    def add(self, rows: list[dict[str, Any]]) -> None:
+        self.rows.extend(rows)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows and self.parts > 0:
+            return
+        table = pa.Table.from_pylist(self.rows, schema=self.schema)
+        name = f"part-{self.parts:05d}.parquet"
+        # readers skip hidden files, so unfinished parts never show up in the table
+        partial = self.path / f".{name}"
+        pq.write_table(table, partial, row_group_size=self.batch_size, compression="zstd")
+        partial.rename(self.path / name)
+        self.parts += 1
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
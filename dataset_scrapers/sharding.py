@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import PurePath
+
+
+def ref_of(dataset_dir: PurePath) -> str:
+    """Return the ref (`<user>/<dataset>`) of a dataset directory."""
+    return "/".join(dataset_dir.parts[-2:])
+
+
+@dataclass(frozen=True)
+class Shard:
+    """Slice `index` of `count` disjoint slices of all refs.
+
+    Refs are assigned by a stable hash, so every node computes the same assignment without
+    coordination, the slices are balanced, and adding refs never moves existing ones.
+    """
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, value: str) -> Shard:
+        """Parse a shard given as `i/N` with `0 <= i < N`."""
+        index, _, count = value.partition("/")
+        try:
+            shard = cls(int(index), int(count))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"expected a shard like 0/4, got {value}") from None
+        if not 0 <= shard.index < shard.count:
+            raise argparse.ArgumentTypeError(f"shard index must be in [0, {count}), got {index}")
+        return shard
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def owns(self, ref: str) -> bool:
+        digest = hashlib.blake2b(ref.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big") % self.count == self.index
+
+    def select(self, refs: Iterable[str]) -> list[str]:
+        return [ref for ref in refs if self.owns(ref)]
+
+
+def add_shard_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--shard",
+        type=Shard.parse,
+        default=None,
+        help="only process the refs of shard i of N, given as i/N (default: all refs)",
+    )
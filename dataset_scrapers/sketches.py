@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from pandas import Series
+
+HashArray = npt.NDArray[np.uint64]
+# seed of the hash function of `MinHash`, fixed so that signatures of all runs are comparable
+MINHASH_SEED = 42
+
+
+def hash_values(data: Series) -> HashArray:
+    """Hash every value of a series to a 64-bit integer.
+
+    `categorize=False` keeps pandas from factorizing the values first, so the distinct values of
+    high-cardinality columns are never materialized in a hash table.
+    """
+    hashes: HashArray = pd.util.hash_pandas_object(data, index=False, categorize=False).to_numpy(
+        dtype=np.uint64
+    )
+    return hashes
+
+
+def _native(value: Any) -> Any:  # noqa: ANN401
+    """Convert NumPy scalars to Python scalars so that they can be used as JSON keys."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _bit_length(values: HashArray) -> npt.NDArray[np.int64]:
+    """Vectorized `int.bit_length` for unsigned 64-bit integers."""
+    values = values.copy()
+    lengths = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= np.uint64(1 << shift)
+        values[mask] >>= np.uint64(shift)
+        lengths[mask] += shift
+    lengths[values > 0] += 1
+    return lengths
+
+
+class HyperLogLog:
+    """HyperLogLog cardinality estimator over pre-hashed 64-bit values."""
+
+    def __init__(self, precision: int = 14) -> None:
+        self.precision = precision
+        self.n_registers = 1 << precision
+        self.registers = np.zeros(self.n_registers, dtype=np.uint8)
+
+    def update(self, hashes: HashArray) -> None:
+        # the first `precision` bits select the register, the rest determine the rank
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        remainder = hashes << np.uint64(self.precision)
+        rank = np.minimum(65 - _bit_length(remainder), 65 - self.precision)
+        np.maximum.at(self.registers, index, rank.astype(np.uint8))
+
+    def merge(self, other: HyperLogLog) -> None:
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        m = self.n_registers
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m**2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # small range correction (linear counting)
+        if estimate <= 2.5 * m and zeros > 0:
+            estimate = m * np.log(m / zeros)
+        return round(float(estimate))
+
+
+def mix64(values: HashArray) -> HashArray:
+    """Vectorized 64-bit finalizer of MurmurHash3, a bijection that scrambles all bits."""
+    mixed = values ^ (values >> np.uint64(33))
+    mixed *= np.uint64(0xFF51AFD7ED558CCD)
+    mixed ^= mixed >> np.uint64(33)
+    mixed *= np.uint64(0xC4CEB9FE1A85EC53)
+    mixed ^= mixed >> np.uint64(33)
+    return mixed
+
+
+def band_hashes(signatures: npt.NDArray[np.uint32]) -> HashArray:
+    """Hash each row of a slice of MinHash signatures to a single LSH bucket key."""
+    keys = np.zeros(len(signatures), dtype=np.uint64)
+    for j in range(signatures.shape[1]):
+        keys = mix64(keys ^ signatures[:, j].astype(np.uint64))
+    return keys
+
+
+class MinHash:
+    """One-permutation MinHash signature of a set of distinct values over pre-hashed values.
+
+    The value hashes are scrambled with a seed and split into `num_perm` bins by their residue,
+    and each bin keeps its minimum, so an update costs a single hash per value instead of one per
+    permutation. Empty bins borrow the minimum of the next non-empty bin (densification by
+    rotation). The fraction of equal entries of two signatures estimates the Jaccard similarity
+    of their sets. Only the upper 32 bits of each entry are kept, which halves the size of
+    signatures without affecting the estimate noticeably.
+    """
+
+    def __init__(self, num_perm: int = 128) -> None:
+        self.num_perm = num_perm
+        self.minimums = np.full(num_perm, np.iinfo(np.uint64).max, dtype=np.uint64)
+
+    def update(self, hashes: HashArray) -> None:
+        # scramble the hashes so that bins do not correlate with the registers of HyperLogLog
+        hashes = mix64(hashes ^ np.uint64(MINHASH_SEED))
+        bins = (hashes % np.uint64(self.num_perm)).astype(np.intp)
+        np.minimum.at(self.minimums, bins, hashes)
+
+    def merge(self, other: MinHash) -> None:
+        if other.num_perm != self.num_perm:
+            raise ValueError("Cannot merge MinHash sketches with a different number of bins")
+        np.minimum(self.minimums, other.minimums, out=self.minimums)
+
+    def signature(self) -> list[int] | None:
+        """Return the signature as a list of 32-bit integers, or `None` for an empty set."""
+        filled = np.flatnonzero(self.minimums != np.iinfo(np.uint64).max)
+        if len(filled) == 0:
+            return None
+        bins = np.arange(self.num_perm)
+        source = filled[np.searchsorted(filled, bins) % len(filled)]
+        # the distance to the source bin keeps borrowed entries distinct from the source entry
+        distance = ((source - bins) % self.num_perm).astype(np.uint64)
+        entries = mix64(self.minimums[source] + distance)
+        signature: list[int] = (entries >> np.uint64(32)).astype(np.uint32).tolist()
+        return signature
+
+
+class FrequentItems:
+    """Misra-Gries heavy-hitters summary over pre-hashed values.
+
+    The summary keeps at most `capacity` counters. As long as no more than `capacity` distinct
+    values are seen, all counts are exact. Each counter also remembers the position of the first
+    occurrence of its value so that callers can map hashes back to the original values.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.exact = True
+        self.keys: HashArray = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.positions = np.empty(0, dtype=np.int64)
+
+    def update(self, hashes: HashArray, offset: int = 0) -> None:
+        keys, first, counts = np.unique(hashes, return_index=True, return_counts=True)
+        keys = np.concatenate([self.keys, keys])
+        counts = np.concatenate([self.counts, counts])
+        positions = np.concatenate([self.positions, first + offset])
+
+        keys, inverse = np.unique(keys, return_inverse=True)
+        merged_counts = np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
+        merged_positions = np.full(len(keys), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(merged_positions, inverse, positions)
+
+        if len(keys) > self.capacity:
+            # subtract the (capacity + 1)-th largest count and drop non-positive counters
+            threshold = np.partition(merged_counts, -(self.capacity + 1))[-(self.capacity + 1)]
+            merged_counts -= threshold
+            keep = merged_counts > 0
+            keys, merged_counts = keys[keep], merged_counts[keep]
+            merged_positions = merged_positions[keep]
+            self.exact = False
+
+        self.keys, self.counts, self.positions = keys, merged_counts, merged_positions
+
+    def most_common(self, n: int | None = None) -> list[tuple[int, int]]:
+        """Return `(position, count)` pairs ordered by count and first occurrence."""
+        order = np.lexsort((self.positions, -self.counts))[:n]
+        return [
+            (int(p), int(c))
+            for p, c in zip(self.positions[order], self.counts[order], strict=True)
+        ]
+
+
+@dataclass
+class ValueCounts:
+    n_unique: int
+    most_common: dict[Any, int]
+    exact: bool
+
+
+def count_values(
+    data: Series,
+    top_n: int | None = 10,
+    capacity: int | None = None,
+    chunk_size: int = 2**20,
+    minhash: MinHash | None = None,
+) -> ValueCounts:
+    """Count distinct values and the most common values of a series in one hashed pass.
+
+    Without a `capacity`, all values are counted exactly. With a `capacity`, the series is hashed
+    in chunks and the counts are tracked with a bounded heavy-hitters summary. If the column turns
+    out to have more distinct values than `capacity`, the distinct count is estimated with
+    HyperLogLog and the most common values are approximate. If a `minhash` sketch is given, it
+    is updated with the same hashes.
+    """
+    if capacity is None:
+        keys, first, counts = np.unique(hash_values(data), return_index=True, return_counts=True)
+        if minhash is not None:
+            minhash.update(keys)
+        order = np.lexsort((first, -counts))[:top_n]
+        most_common = {_native(data.iloc[int(first[i])]): int(counts[i]) for i in order}
+        return ValueCounts(n_unique=len(keys), most_common=most_common, exact=True)
+
+    hll = HyperLogLog()
+    summary = FrequentItems(capacity)
+    for offset in range(0, len(data), chunk_size):
+        hashes = hash_values(data.iloc[offset : offset + chunk_size])
+        hll.update(hashes)
+        summary.update(hashes, offset)
+        if minhash is not None:
+            minhash.update(hashes)
+
+    most_common = {_native(data.iloc[p]): c for p, c in summary.most_common(top_n)}
+    if summary.exact:
+        return ValueCounts(n_unique=len(summary.keys), most_common=most_common, exact=True)
+    return ValueCounts(n_unique=hll.count(), most_common=most_common, exact=False)
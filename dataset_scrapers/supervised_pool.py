@@ -0,0 +1,304 @@
+from __future__ import annotations
+
+import contextlib
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+    from multiprocessing.connection import Connection
+    from multiprocessing.context import BaseContext
+    from multiprocessing.process import BaseProcess
+    from types import TracebackType
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+class TaskTimeoutError(TimeoutError):
+    pass
+
+
+class MemoryLimitError(MemoryError):
+    pass
+
+
+class WorkerCrashedError(RuntimeError):
+    pass
+
+
+def available_memory() -> int:
+    """Return the memory available for new allocations in bytes."""
+    with contextlib.suppress(OSError):
+        for line in Path("/proc/meminfo").read_text(encoding="ascii").splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) * 1024
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def resident_memory(pid: int | None) -> int | None:
+    """Return the resident set size of a process in bytes, or `None` if it is unknown."""
+    try:
+        statm = Path(f"/proc/{pid}/statm").read_text(encoding="ascii")
+        return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _work(
+    connection: Connection,
+    func: Callable[[Any], Any],
+    initializer: Callable[..., None] | None,
+    initargs: tuple[Any, ...],
+) -> None:
+    if initializer is not None:
+        initializer(*initargs)
+    while (task := connection.recv()) is not None:
+        try:
+            message: tuple[Any, Exception | None] = (func(task), None)
+        except Exception as e:  # noqa: BLE001
+            message = (None, e)
+        try:
+            connection.send(message)
+        except Exception as e:  # noqa: BLE001
+            connection.send((None, RuntimeError(f"{type(e).__name__}: {e}")))
+
+
+@dataclass
+class Outcome(Generic[T, R]):
+    task: T
+    result: R | None
+    error: Exception | None
+
+
+class _Worker:
+    def __init__(
+        self,
+        context: BaseContext,
+        func: Callable[[Any], Any],
+        initializer: Callable[..., None] | None,
+        initargs: tuple[Any, ...],
+    ) -> None:
+        self.connection, child_connection = context.Pipe()
+        self.process: BaseProcess = context.Process(  # type: ignore[attr-defined]
+            target=_work, args=(child_connection, func, initializer, initargs), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.task: Any = None
+        self.estimate = 0
+        self.started = 0.0
+        self.n_tasks = 0
+
+    @property
+    def busy(self) -> bool:
+        return self.task is not None
+
+    def submit(self, task: Any, estimate: int) -> bool:  # noqa: ANN401
+        """Send a task to the worker, or return `False` if the worker is gone."""
+        try:
+            self.connection.send(task)
+        except OSError:
+            return False
+        self.task, self.estimate, self.started = task, estimate, time.monotonic()
+        self.n_tasks += 1
+        return True
+
+    def release(self) -> Any:  # noqa: ANN401
+        task, self.task, self.estimate = self.task, None, 0
+        return task
+
+    def stop(self) -> None:
+        with contextlib.suppress(OSError):
+            self.connection.send(None)
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class SupervisedPool(Generic[T, R]):
+    """Process pool that supervises its workers.
+
+    Compared to `multiprocessing.Pool`, this pool can kill and replace a worker that exceeds a
+    wall-clock limit per task or a resident memory limit, and then reports the task as failed
+    instead of losing it. Workers can be recycled after a number of tasks. If a memory estimate
+    per task is given, tasks are only admitted while the estimates of all running tasks fit into
+    the memory budget and the memory currently available. A task that runs alone is always
+    admitted, so that oversized tasks still run eventually.
+    """
+
+    def __init__(
+        self,
+        func: Callable[[T], R],
+        processes: int,
+        initializer: Callable[..., None] | None = None,
+        initargs: tuple[Any, ...] = (),
+        context: BaseContext | None = None,
+        task_timeout: float | None = None,
+        max_rss: int | None = None,
+        max_tasks_per_child: int | None = None,
+        memory_estimate: Callable[[T], int] | None = None,
+        memory_budget: int | None = None,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self.func = func
+        self.initializer = initializer
+        self.initargs = initargs
+        self.context = context or mp.get_context()
+        self.task_timeout = task_timeout
+        self.max_rss = max_rss
+        self.max_tasks_per_child = max_tasks_per_child
+        self.memory_estimate = memory_estimate
+        self.memory_budget = memory_budget
+        self.poll_interval = poll_interval
+        # look ahead far enough to find small tasks that fit next to big ones
+        self.lookahead = 4 * processes
+        self.workers = [self._start_worker() for _ in range(processes)]
+
+    def __enter__(self) -> SupervisedPool[T, R]:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+    def _start_worker(self) -> _Worker:
+        return _Worker(self.context, self.func, self.initializer, self.initargs)
+
+    def _replace(self, worker: _Worker, kill: bool) -> _Worker:
+        if kill:
+            worker.kill()
+        else:
+            worker.stop()
+        replacement = self._start_worker()
+        self.workers[self.workers.index(worker)] = replacement
+        return replacement
+
+    def _admits(self, estimate: int) -> bool:
+        running = [worker.estimate for worker in self.workers if worker.busy]
+        if not running or self.memory_estimate is None:
+            return True
+        if self.memory_budget is not None and sum(running) + estimate > self.memory_budget:
+            return False
+        return estimate <= available_memory()
+
+    def _dispatch(self, pending: list[T]) -> None:
+        for idle in [worker for worker in self.workers if not worker.busy]:
+            # an idle worker may have died, e.g. in its initializer or by a signal
+            worker = idle if idle.process.is_alive() else self._replace(idle, kill=True)
+            for i, task in enumerate(pending):
+                estimate = 0 if self.memory_estimate is None else self.memory_estimate(task)
+                if self._admits(estimate):
+                    if not worker.submit(pending.pop(i), estimate):
+                        # the worker died since the check, so the task stays pending
+                        pending.insert(i, task)
+                        self._replace(worker, kill=True)
+                    break
+            else:
+                return
+
+    def _collect(self, timeout: float) -> list[Outcome[T, R]]:
+        busy = [worker for worker in self.workers if worker.busy]
+        if not busy:
+            return []
+        waitables = [w.connection for w in busy] + [w.process.sentinel for w in busy]
+        ready = set(wait(waitables, timeout=timeout))
+
+        outcomes: list[Outcome[T, R]] = []
+        now = time.monotonic()
+        for worker in busy:
+            if worker.connection in ready:
+                try:
+                    result, error = worker.connection.recv()
+                except (EOFError, OSError):
+                    code = worker.process.exitcode
+                    error = WorkerCrashedError(f"Worker exited with code {code}")
+                    outcomes.append(Outcome(worker.release(), None, error))
+                    self._replace(worker, kill=True)
+                    continue
+                outcomes.append(Outcome(worker.release(), result, error))
+                if self.max_tasks_per_child and worker.n_tasks >= self.max_tasks_per_child:
+                    self._replace(worker, kill=False)
+            elif (error := self._violation(worker, ready, now)) is not None:
+                outcomes.append(Outcome(worker.release(), None, error))
+                self._replace(worker, kill=True)
+        return outcomes
+
+    def _violation(self, worker: _Worker, ready: set[Any], now: float) -> Exception | None:
+        """Return the reason why a busy worker has to be killed, if any."""
+        if worker.process.sentinel in ready:
+            return WorkerCrashedError(f"Worker exited with code {worker.process.exitcode}")
+        if self.task_timeout is not None and now - worker.started > self.task_timeout:
+            return TaskTimeoutError(f"Task exceeded {self.task_timeout:g} seconds")
+        if self.max_rss is not None:
+            rss = resident_memory(worker.process.pid)
+            if rss is not None and rss > self.max_rss:
+                return MemoryLimitError(f"Worker exceeded {self.max_rss / 1024**2:.0f} MB")
+        return None
+
+    def imap_unordered(self, tasks: Iterable[T]) -> Iterator[Outcome[T, R]]:
+        """Run `func` on all tasks and yield their outcomes in completion order.
+
+        The tasks are consumed in a separate thread, so the iterable may block until earlier
+        outcomes have been processed by the caller.
+        """
+        feed: queue.Queue[Any] = queue.Queue(maxsize=self.lookahead)
+        failures: list[BaseException] = []
+
+        def feeder() -> None:
+            try:
+                for task in tasks:
+                    feed.put(task)
+            except BaseException as e:
+                failures.append(e)
+                raise
+            finally:
+                feed.put(_DONE)
+
+        threading.Thread(target=feeder, daemon=True).start()
+        pending: list[T] = []
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < self.lookahead:
+                idle = not pending and not any(worker.busy for worker in self.workers)
+                try:
+                    item = feed.get(block=idle)
+                except queue.Empty:
+                    break
+                if item is _DONE:
+                    exhausted = True
+                else:
+                    pending.append(item)
+            if failures:
+                raise failures[0]
+            if exhausted and not pending and not any(worker.busy for worker in self.workers):
+                return
+            self._dispatch(pending)
+            # poll faster while idle workers wait for the feeder to produce more tasks
+            starving = not exhausted and not all(worker.busy for worker in self.workers)
+            yield from self._collect(
+                min(self.poll_interval, 0.05) if starving else self.poll_interval
+            )